@@ -2,41 +2,156 @@
 FastAPI Application for Crop Stress Prediction
 """
 
-from fastapi import FastAPI, HTTPException
+import os
+import orjson
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.cors import ALL_METHODS, SAFELISTED_HEADERS
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 
-from src.stress_predictor import CropStressPredictor
+from src.stress_predictor import PredictionMetadata, PredictionResult, get_predictor
+
+# Browser origins allowed to call the API (comma separated); a wildcard is
+# not valid together with credentials
+ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in os.environ.get(
+        "ALLOWED_ORIGINS",
+        "http://localhost:8000,http://localhost:5174,http://localhost:5000"
+    ).split(",")
+    if origin.strip()
+]
+
+# CORS policy shared by CORSMiddleware and PreflightMiddleware
+CORS_ALLOW_METHODS = ["*"]
+CORS_ALLOW_HEADERS = ["*"]
+CORS_ALLOW_CREDENTIALS = True
+CORS_MAX_AGE = 600
+
+# Worker threads for sync (CPU-bound) endpoints; anyio defaults to 40
+THREADPOOL_SIZE = int(os.environ.get("ML_THREADPOOL_SIZE", (os.cpu_count() or 1) * 2))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Size the threadpool that runs the sync prediction endpoints"""
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    yield
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Crop Stress Monitoring API",
     description="ML-powered crop stress prediction system for precision agriculture",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+
+class PreflightMiddleware:
+    """
+    Answer CORS preflights that CORSMiddleware would allow straight from ASGI
+    
+    Takes the same policy arguments as CORSMiddleware and builds the
+    response headers once per origin, so an allowed preflight costs a
+    single send pair. Anything it would not allow (origin, method or
+    headers) falls through to CORSMiddleware, which rejects it.
+    """
+    
+    def __init__(
+        self,
+        app,
+        allow_origins: list,
+        allow_methods: list,
+        allow_headers: list,
+        allow_credentials: bool,
+        max_age: int
+    ):
+        self.app = app
+        methods = ALL_METHODS if "*" in allow_methods else allow_methods
+        self.allow_methods = {method.encode("latin-1") for method in methods}
+        self.allow_all_headers = "*" in allow_headers
+        allowed_headers = sorted(SAFELISTED_HEADERS | set(allow_headers))
+        self.allow_headers = {header.lower().encode("latin-1") for header in allowed_headers}
+        
+        common = [
+            (b"access-control-allow-methods", ", ".join(methods).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"vary", b"Origin"),
+            (b"content-length", b"0"),
+        ]
+        if not self.allow_all_headers:
+            common.append((b"access-control-allow-headers", ", ".join(allowed_headers).encode("latin-1")))
+        if allow_credentials:
+            common.append((b"access-control-allow-credentials", b"true"))
+        
+        self.headers = {
+            origin.encode("latin-1"): [(b"access-control-allow-origin", origin.encode("latin-1"))] + common
+            for origin in allow_origins
+        }
+    
+    def _allows_headers(self, requested: bytes) -> bool:
+        """Whether every requested header is allowed"""
+        return self.allow_all_headers or all(
+            header.strip() in self.allow_headers for header in requested.lower().split(b",")
+        )
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "OPTIONS":
+            request_headers = dict(scope["headers"])
+            headers = self.headers.get(request_headers.get(b"origin"))
+            method = request_headers.get(b"access-control-request-method")
+            requested = request_headers.get(b"access-control-request-headers")
+            
+            if (
+                headers is not None
+                and method in self.allow_methods
+                and (requested is None or self._allows_headers(requested))
+            ):
+                if requested is not None and self.allow_all_headers:
+                    headers = headers + [(b"access-control-allow-headers", requested)]
+                
+                await send({"type": "http.response.start", "status": 200, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        
+        await self.app(scope, receive, send)
+
+
 # Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+CORS_POLICY = dict(
+    allow_origins=ALLOWED_ORIGINS,
+    allow_methods=CORS_ALLOW_METHODS,
+    allow_headers=CORS_ALLOW_HEADERS,
+    allow_credentials=CORS_ALLOW_CREDENTIALS,
+    max_age=CORS_MAX_AGE,
 )
+app.add_middleware(CORSMiddleware, **CORS_POLICY)
+app.add_middleware(PreflightMiddleware, **CORS_POLICY)
+
 
 # Initialize predictor
-predictor = CropStressPredictor()
+predictor = get_predictor()
 
 
 # Request models
 class WeatherData(BaseModel):
-    avg_temp: float = Field(..., description="Average temperature (°C)")
-    rainfall: float = Field(0.0, description="Recent rainfall (mm)")
-    rolling_7day_rainfall: float = Field(0.0, description="7-day cumulative rainfall (mm)")
+    avg_temp: float = Field(..., allow_inf_nan=False, description="Average temperature (°C)")
+    rainfall: float = Field(0.0, allow_inf_nan=False, description="Recent rainfall (mm)")
+    rolling_7day_rainfall: float = Field(0.0, allow_inf_nan=False, description="7-day cumulative rainfall (mm)")
     consecutive_dry_days: int = Field(0, description="Number of consecutive dry days")
-    temp_deviation_from_normal: float = Field(0.0, description="Temperature deviation from normal (°C)")
+    temp_deviation_from_normal: float = Field(
+        0.0, allow_inf_nan=False, description="Temperature deviation from normal (°C)"
+    )
 
 
 class StressPredictionRequest(BaseModel):
@@ -75,9 +190,77 @@ class StressPredictionResponse(BaseModel):
     metadata: Dict[str, Any]
 
 
+def as_percent(confidence: float) -> float:
+    """Raw 0-1 confidence as the rounded percentage shown to clients"""
+    return round(confidence * 100, 1)
+
+
+def encode_prediction(obj):
+    """
+    orjson default for predictor results
+    
+    Results keep raw confidences; they are only converted to percentages
+    here, in the public response shape.
+    """
+    if isinstance(obj, PredictionResult):
+        return {
+            "stress_type": obj.stress_type,
+            "severity": obj.severity,
+            "severity_color": obj.severity_color,
+            "confidence": as_percent(obj.confidence),
+            "advisory": obj.advisory,
+            "explanation": obj.explanation,
+            "metadata": obj.metadata
+        }
+    if isinstance(obj, PredictionMetadata):
+        return {
+            "growth_stage": obj.growth_stage,
+            "days_after_sowing": obj.days_after_sowing,
+            "season": obj.season,
+            "ml_prediction": obj.ml_prediction,
+            "ml_confidence": as_percent(obj.ml_confidence),
+            "validation_reason": obj.validation_reason
+        }
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class PredictionJSONResponse(ORJSONResponse):
+    """ORJSONResponse that serializes PredictionResult via encode_prediction"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=encode_prediction, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def to_input_data(request: StressPredictionRequest) -> Dict[str, Any]:
+    """
+    Build predictor input from an already-validated request
+    
+    Reads fields directly instead of a recursive model_dump(); the nested
+    weather model's field dict is passed through as is (read-only use).
+    """
+    return {
+        "crop_type": request.crop_type,
+        "sowing_date": request.sowing_date,
+        "soil_type": request.soil_type,
+        "season": request.season,
+        "weather": request.weather.__dict__
+    }
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """
+    422 with the validation errors, serialized by orjson
+    
+    Errors echo the rejected input, which may be NaN/Infinity; the default
+    handler's stdlib JSON encoding refuses those, orjson writes null.
+    """
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
+
 # Endpoints
 @app.get("/")
-def root():
+async def root():
     """Root endpoint - API info"""
     return {
         "service": "Crop Stress Monitoring API",
@@ -86,22 +269,25 @@ def root():
         "endpoints": {
             "health": "/health",
             "predict": "/api/predict",
-            "batch_predict": "/api/batch-predict"
+            "batch_predict": "/api/batch-predict",
+            "batch_predict_fast": "/api/batch-predict-fast"
         }
     }
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "model_loaded": predictor.ml_model.model is not None
+        "model_loaded": predictor.ml_model.is_loaded
     }
 
 
-@app.post("/api/predict", response_model=StressPredictionResponse)
+# The predictor's PredictionResult is serialized directly by
+# PredictionJSONResponse; the model is only attached for the OpenAPI docs
+@app.post("/api/predict", responses={200: {"model": StressPredictionResponse}})
 def predict_stress(request: StressPredictionRequest):
     """
     Predict crop stress from input data
@@ -114,12 +300,12 @@ def predict_stress(request: StressPredictionRequest):
     """
     try:
         # Convert request to dict
-        input_data = request.model_dump()
+        input_data = to_input_data(request)
         
         # Run prediction
         result = predictor.predict(input_data)
         
-        return result
+        return PredictionJSONResponse(result)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
@@ -138,30 +324,44 @@ def batch_predict_stress(requests: list[StressPredictionRequest]):
     """
     try:
         # Convert requests to dicts
-        input_batch = [req.model_dump() for req in requests]
+        input_batch = [to_input_data(req) for req in requests]
         
         # Run batch prediction
         results = predictor.batch_predict(input_batch)
         
-        return {"predictions": results}
+        return PredictionJSONResponse({"predictions": results})
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch prediction error: {str(e)}")
+
+
+@app.post("/api/batch-predict-fast")
+def batch_predict_fast(requests: list[StressPredictionRequest]):
+    """
+    Predict stress labels for many crops without explanations
+    
+    Args:
+        requests: List of crop and weather data
+    
+    Returns:
+        Column-oriented stress types, severities and confidences
+    """
+    try:
+        input_batch = [to_input_data(req) for req in requests]
+        
+        results = predictor.batch_predict_fast(input_batch)
+        results["confidence"] = [as_percent(confidence) for confidence in results["confidence"]]
+        
+        return ORJSONResponse(results)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Batch prediction error: {str(e)}")
 
 
 @app.get("/api/model/info")
-def model_info():
+async def model_info():
     """Get model information"""
-    feature_importance = predictor.ml_model.get_feature_importance()
-    
-    return {
-        "model_type": "Random Forest Classifier",
-        "n_estimators": 50,
-        "max_depth": 10,
-        "features": list(feature_importance.keys()),
-        "feature_importance": feature_importance,
-        "stress_types": ["moisture_stress", "heat_stress", "waterlogging", "no_stress"]
-    }
+    return ORJSONResponse(predictor.ml_model.model_info)
 
 
 if __name__ == "__main__":
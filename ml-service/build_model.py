@@ -0,0 +1,17 @@
+"""
+Build the prebuilt model artifact
+
+Trains the stress model once and writes models/stress_model.joblib, which
+StressMLModel loads at startup instead of refitting in every worker.
+
+Usage:
+    python build_model.py
+"""
+
+from src.model import MODEL_PATH, StressMLModel
+
+
+if __name__ == "__main__":
+    model = StressMLModel(model_path=None)
+    model.save(MODEL_PATH)
+    print(f"✓ Model written to {MODEL_PATH}")
@@ -1,20 +1,33 @@
 """
 Initialize src package
+
+Public names are resolved lazily (PEP 562) so importing one submodule
+doesn't pull in the whole pipeline and its heavy dependencies.
 """
 
-from .feature_engineering import engineer_features
-from .model import StressMLModel
-from .rule_engine import apply_rules
-from .severity import compute_severity
-from .explainer import generate_explanation, generate_advisory
-from .stress_predictor import CropStressPredictor
+import importlib
+
+_EXPORTS = {
+    'FeatureVec': '.feature_engineering',
+    'engineer_features': '.feature_engineering',
+    'StressMLModel': '.model',
+    'StressType': '.stress_types',
+    'apply_rules': '.rule_engine',
+    'classify_and_score': '.rule_engine',
+    'compute_severity': '.severity',
+    'generate_explanation': '.explainer',
+    'generate_advisory': '.explainer',
+    'CropStressPredictor': '.stress_predictor',
+    'PredictionResult': '.stress_predictor',
+    'get_predictor': '.stress_predictor'
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    'engineer_features',
-    'StressMLModel',
-    'apply_rules',
-    'compute_severity',
-    'generate_explanation',
-    'generate_advisory',
-    'CropStressPredictor'
-]
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
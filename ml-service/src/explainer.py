@@ -3,13 +3,13 @@ Explainability Module
 Generate human-readable explanations for stress predictions
 """
 
-from typing import Dict
+from .feature_engineering import FeatureVec
 
 
 def generate_explanation(
     stress_type: str,
     severity: str,
-    features: Dict,
+    features: FeatureVec,
     confidence: float,
     validation_reason: str
 ) -> str:
@@ -41,10 +41,10 @@ def generate_explanation(
     return "Stress detected based on current conditions."
 
 
-def _explain_no_stress(features: Dict) -> str:
+def _explain_no_stress(features: FeatureVec) -> str:
     """Explain why no stress is detected"""
-    growth_stage = features['growth_stage']
-    season = features['season']
+    growth_stage = features.growth_stage
+    season = features.season
     
     explanation = (
         f"Crop is currently in {growth_stage} stage with favorable conditions. "
@@ -55,153 +55,114 @@ def _explain_no_stress(features: Dict) -> str:
     return explanation
 
 
-def _explain_moisture_stress(features: Dict, severity: str, reason: str) -> str:
+def _explain_moisture_stress(features: FeatureVec, severity: str, reason: str) -> str:
     """Explain moisture stress detection"""
-    growth_stage = features['growth_stage']
-    season = features['season']
-    crop_type = features['crop_type']
-    dry_days = features['dry_days_norm']
-    rainfall = features['rolling_rainfall_norm']
-    soil_type = features['soil_type']
-    
-    # Build explanation
-    parts = []
-    
-    # Opening
-    parts.append(
-        f"Moisture stress detected in {crop_type} during {growth_stage} stage."
+    growth_stage = features.growth_stage
+    season = features.season
+    dry_days = features.dry_days_norm
+    
+    # Optional clauses
+    dry_clause = (
+        f" Field has experienced approximately {int(dry_days * 14)} consecutive dry days."
+        if dry_days > 0.5 else ""
     )
-    
-    # Dry period
-    if dry_days > 0.5:
-        dry_days_approx = int(dry_days * 14)
-        parts.append(
-            f"Field has experienced approximately {dry_days_approx} consecutive dry days."
-        )
-    
-    # Rainfall deficit
-    if rainfall < 0.4:
-        parts.append(
-            f"Recent rainfall has been below normal levels for {season} season."
-        )
-    
-    # Soil factor
-    parts.append(
-        f"Soil type ({soil_type}) has moderate water retention capacity."
+    rain_clause = (
+        f" Recent rainfall has been below normal levels for {season} season."
+        if features.rolling_rainfall_norm < 0.4 else ""
     )
-    
-    # Critical stage warning
-    if growth_stage in ['flowering', 'grain_filling']:
-        parts.append(
-            f"This is a critical growth stage - moisture stress can significantly impact yield."
-        )
-    
-    # Seasonal context
-    parts.append(
-        f"Seasonal baseline applied: {season}."
+    stage_clause = (
+        " This is a critical growth stage - moisture stress can significantly impact yield."
+        if growth_stage in ('flowering', 'grain_filling') else ""
     )
     
-    return " ".join(parts)
+    return (
+        f"Moisture stress detected in {features.crop_type} during {growth_stage} stage."
+        f"{dry_clause}{rain_clause}"
+        f" Soil type ({features.soil_type}) has moderate water retention capacity."
+        f"{stage_clause}"
+        f" Seasonal baseline applied: {season}."
+    )
 
 
-def _explain_heat_stress(features: Dict, severity: str, reason: str) -> str:
+def _explain_heat_stress(features: FeatureVec, severity: str, reason: str) -> str:
     """Explain heat stress detection"""
-    growth_stage = features['growth_stage']
-    season = features['season']
-    crop_type = features['crop_type']
-    temp_norm = features['avg_temp_norm']
-    temp_dev = features['temp_deviation_norm']
+    growth_stage = features.growth_stage
     
     # Estimate actual temperature
-    estimated_temp = 15 + (temp_norm * 30)
-    
-    parts = []
-    
-    # Opening
-    parts.append(
-        f"Heat stress detected in {crop_type} during {growth_stage} stage."
-    )
+    estimated_temp = 15 + (features.avg_temp_norm * 30)
     
-    # Temperature level
-    parts.append(
-        f"Current temperatures (approximately {estimated_temp:.1f}°C) are above optimal range."
+    # Optional clauses
+    deviation_clause = (
+        " Temperatures are significantly higher than historical averages for this period."
+        if features.temp_deviation_norm > 0.6 else ""
     )
-    
-    # Temperature deviation
-    if temp_dev > 0.6:
-        parts.append(
-            "Temperatures are significantly higher than historical averages for this period."
-        )
-    
-    # Evapotranspiration risk
-    parts.append(
-        "High temperatures increase evapotranspiration, raising water demand."
+    stage_clause = (
+        " Heat stress during this critical stage can cause flower abortion and reduce grain formation."
+        if growth_stage in ('flowering', 'grain_filling') else ""
     )
     
-    # Critical stage warning
-    if growth_stage in ['flowering', 'grain_filling']:
-        parts.append(
-            "Heat stress during this critical stage can cause flower abortion and reduce grain formation."
-        )
-    
-    # Seasonal context
-    parts.append(
-        f"Seasonal baseline applied: {season}."
+    return (
+        f"Heat stress detected in {features.crop_type} during {growth_stage} stage."
+        f" Current temperatures (approximately {estimated_temp:.1f}°C) are above optimal range."
+        f"{deviation_clause}"
+        " High temperatures increase evapotranspiration, raising water demand."
+        f"{stage_clause}"
+        f" Seasonal baseline applied: {features.season}."
     )
-    
-    return " ".join(parts)
 
 
-def _explain_waterlogging(features: Dict, severity: str, reason: str) -> str:
+def _explain_waterlogging(features: FeatureVec, severity: str, reason: str) -> str:
     """Explain waterlogging detection"""
-    growth_stage = features['growth_stage']
-    season = features['season']
-    crop_type = features['crop_type']
-    rainfall = features['rainfall_norm']
-    rolling_rain = features['rolling_rainfall_norm']
-    soil_type = features['soil_type']
-    soil_retention = features['soil_retention']
-    
-    parts = []
-    
-    # Opening
-    parts.append(
-        f"Waterlogging risk detected in {crop_type} during {growth_stage} stage."
-    )
+    growth_stage = features.growth_stage
+    rolling_rain = features.rolling_rainfall_norm
     
-    # Rainfall intensity
-    if rolling_rain > 0.6:
-        estimated_rainfall = int(rolling_rain * 200)
-        parts.append(
-            f"Cumulative rainfall over past 7 days (approximately {estimated_rainfall}mm) is above normal."
-        )
-    
-    # Soil drainage
-    if soil_retention > 0.35:
-        parts.append(
-            f"Soil type ({soil_type}) has high water retention, reducing drainage efficiency."
-        )
-    
-    # Impact
-    parts.append(
-        "Excess water reduces soil oxygen levels, affecting root respiration and nutrient uptake."
+    # Optional clauses
+    rainfall_clause = (
+        f" Cumulative rainfall over past 7 days (approximately {int(rolling_rain * 200)}mm) is above normal."
+        if rolling_rain > 0.6 else ""
     )
-    
-    # Critical stage warning
-    if growth_stage in ['germination', 'vegetative', 'tillering']:
-        parts.append(
-            "Waterlogging during early growth stages can severely damage root systems."
-        )
-    
-    # Seasonal context
-    parts.append(
-        f"Seasonal baseline applied: {season}."
+    drainage_clause = (
+        f" Soil type ({features.soil_type}) has high water retention, reducing drainage efficiency."
+        if features.soil_retention > 0.35 else ""
+    )
+    stage_clause = (
+        " Waterlogging during early growth stages can severely damage root systems."
+        if growth_stage in ('germination', 'vegetative', 'tillering') else ""
     )
     
-    return " ".join(parts)
+    return (
+        f"Waterlogging risk detected in {features.crop_type} during {growth_stage} stage."
+        f"{rainfall_clause}{drainage_clause}"
+        " Excess water reduces soil oxygen levels, affecting root respiration and nutrient uptake."
+        f"{stage_clause}"
+        f" Seasonal baseline applied: {features.season}."
+    )
+
+
+# Advisory text per (stress_type, severity); other severities fall back to 'low'
+ADVISORIES = {
+    'no_stress': {
+        'none': "Continue regular field monitoring and standard crop management practices."
+    },
+    'moisture_stress': {
+        'high': "Increase irrigation frequency by 30-40% immediately. Apply mulch to reduce evaporation. Monitor soil moisture daily.",
+        'medium': "Increase irrigation frequency by 20%. Consider light irrigation at critical times. Monitor crop stress symptoms.",
+        'low': "Plan supplemental irrigation. Monitor weather forecast and soil moisture levels closely."
+    },
+    'heat_stress': {
+        'high': "Increase irrigation to maintain soil moisture. Avoid field operations during peak heat hours. Consider protective measures for sensitive stages.",
+        'medium': "Maintain adequate soil moisture through regular irrigation. Monitor crop canopy temperature. Avoid stress-inducing operations.",
+        'low': "Ensure adequate water supply. Monitor temperature trends and crop response."
+    },
+    'waterlogging': {
+        'high': "Implement emergency drainage immediately. Avoid field operations to prevent soil compaction. Monitor for disease symptoms.",
+        'medium': "Improve field drainage. Reduce irrigation. Allow soil to dry before next irrigation cycle.",
+        'low': "Monitor drainage conditions. Adjust irrigation schedule based on rainfall. Check soil moisture before irrigation."
+    }
+}
 
 
-def generate_advisory(stress_type: str, severity: str, features: Dict) -> str:
+def generate_advisory(stress_type: str, severity: str, features: FeatureVec) -> str:
     """
     Generate actionable advisory based on stress type
     
@@ -213,31 +174,12 @@ def generate_advisory(stress_type: str, severity: str, features: Dict) -> str:
     Returns:
         Advisory message
     """
-    if stress_type == 'no_stress':
-        return "Continue regular field monitoring and standard crop management practices."
+    advisories = ADVISORIES.get(stress_type)
     
-    elif stress_type == 'moisture_stress':
-        if severity == 'high':
-            return "Increase irrigation frequency by 30-40% immediately. Apply mulch to reduce evaporation. Monitor soil moisture daily."
-        elif severity == 'medium':
-            return "Increase irrigation frequency by 20%. Consider light irrigation at critical times. Monitor crop stress symptoms."
-        else:
-            return "Plan supplemental irrigation. Monitor weather forecast and soil moisture levels closely."
+    if advisories is None:
+        return "Monitor field conditions and adjust management practices accordingly."
     
-    elif stress_type == 'heat_stress':
-        if severity == 'high':
-            return "Increase irrigation to maintain soil moisture. Avoid field operations during peak heat hours. Consider protective measures for sensitive stages."
-        elif severity == 'medium':
-            return "Maintain adequate soil moisture through regular irrigation. Monitor crop canopy temperature. Avoid stress-inducing operations."
-        else:
-            return "Ensure adequate water supply. Monitor temperature trends and crop response."
+    if stress_type == 'no_stress':
+        return advisories['none']
     
-    elif stress_type == 'waterlogging':
-        if severity == 'high':
-            return "Implement emergency drainage immediately. Avoid field operations to prevent soil compaction. Monitor for disease symptoms."
-        elif severity == 'medium':
-            return "Improve field drainage. Reduce irrigation. Allow soil to dry before next irrigation cycle."
-        else:
-            return "Monitor drainage conditions. Adjust irrigation schedule based on rainfall. Check soil moisture before irrigation."
-    
-    return "Monitor field conditions and adjust management practices accordingly."
+    return advisories.get(severity, advisories['low'])
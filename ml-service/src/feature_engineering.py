@@ -3,9 +3,12 @@ Feature Engineering Module
 Compute features from raw crop and weather data
 """
 
-from datetime import datetime, timedelta
+import sys
+from bisect import bisect_left
+from datetime import date
+from functools import lru_cache
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, NamedTuple, Optional
 
 
 # Growth stage mappings by crop type (days after sowing ranges)
@@ -42,6 +45,16 @@ GROWTH_STAGES = {
     }
 }
 
+# Stage upper bounds per crop for bisect lookup; the trailing name catches
+# days beyond the last stage
+_STAGE_BOUNDS = {
+    crop: (
+        tuple(max_days for (_, max_days) in stages),
+        tuple(stages.values()) + ('post_maturity',)
+    )
+    for crop, stages in GROWTH_STAGES.items()
+}
+
 # Season encoding
 SEASON_ENCODING = {
     'monsoon': 0,
@@ -64,19 +77,96 @@ SOIL_WATER_RETENTION = {
 }
 
 
-def compute_days_after_sowing(sowing_date: str) -> int:
+class FeatureVec(NamedTuple):
+    """
+    Engineered features for one sample
+    
+    Immutable and attribute-accessed, so the hot rule/severity/explainer
+    path reads fields without dict lookups and cached instances can be
+    shared between requests.
+    """
+    crop_type: str
+    days_after_sowing: int
+    growth_stage: str
+    season_encoded: int
+    season: str
+    soil_type: str
+    soil_retention: float
+    avg_temp_norm: float
+    rainfall_norm: float
+    rolling_rainfall_norm: float
+    dry_days_norm: float
+    temp_deviation_norm: float
+    moisture_stress: float
+    heat_stress: float
+    waterlogging: float
+
+
+def _casing_variants(table: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Expand a lowercase snake_case lookup table with the casings clients
+    commonly send (upper, title, space separated), so the hot path can
+    usually skip normalizing the incoming string
+    """
+    variants = {}
+    for key, value in table.items():
+        for name in (key, key.replace('_', ' ')):
+            variants[name] = value
+            variants[name.upper()] = value
+            variants[name.title()] = value
+    return variants
+
+
+_SEASON_LOOKUP = _casing_variants(SEASON_ENCODING)
+_SOIL_RETENTION_LOOKUP = _casing_variants(SOIL_WATER_RETENTION)
+
+
+# Weather normalization ranges: (key, default, offset, scale)
+WEATHER_NORMALIZATION = [
+    ('avg_temp', 25.0, 15.0, 30.0),                    # 15-45°C range
+    ('rainfall', 0.0, 0.0, 100.0),                     # 0-100mm range
+    ('rolling_7day_rainfall', 0.0, 0.0, 200.0),        # 0-200mm range
+    ('consecutive_dry_days', 0, 0.0, 14.0),            # 0-14 days range
+    ('temp_deviation_from_normal', 0.0, -10.0, 20.0)   # -10 to +10°C range
+]
+
+WEATHER_FEATURE_NAMES = [
+    'avg_temp_norm',
+    'rainfall_norm',
+    'rolling_rainfall_norm',
+    'dry_days_norm',
+    'temp_deviation_norm'
+]
+
+_WEATHER_OFFSETS = np.array([offset for _, _, offset, _ in WEATHER_NORMALIZATION])
+_WEATHER_SCALES = np.array([scale for _, _, _, scale in WEATHER_NORMALIZATION])
+
+
+def _clip01(value: float) -> float:
+    """Clamp a scalar to [0, 1] without numpy call overhead"""
+    return 0.0 if value < 0.0 else (1.0 if value > 1.0 else value)
+
+
+@lru_cache(maxsize=1024)
+def _parse_sowing_date(sowing_date: str) -> date:
+    """Parse the date part of an ISO sowing date string"""
+    return date.fromisoformat(sowing_date[:10])
+
+
+def compute_days_after_sowing(sowing_date: str, today: Optional[date] = None) -> int:
     """
     Calculate days after sowing from sowing date
     
     Args:
-        sowing_date: ISO format date string (YYYY-MM-DD)
+        sowing_date: ISO format date string (YYYY-MM-DD); any time part is ignored
+        today: Reference date, defaults to date.today()
     
     Returns:
         Number of days after sowing
     """
-    sowing = datetime.fromisoformat(sowing_date.replace('Z', '+00:00'))
-    now = datetime.now()
-    delta = now - sowing
+    if today is None:
+        today = date.today()
+    delta = today - _parse_sowing_date(sowing_date)
     return max(0, delta.days)
 
 
@@ -93,16 +183,34 @@ def get_growth_stage(crop_type: str, days_after_sowing: int) -> str:
     """
     crop_type = crop_type.lower()
     
-    if crop_type not in GROWTH_STAGES:
+    if crop_type not in _STAGE_BOUNDS:
         return 'unknown'
     
-    stages = GROWTH_STAGES[crop_type]
+    bounds, names = _STAGE_BOUNDS[crop_type]
+    return names[bisect_left(bounds, days_after_sowing)]
+
+
+def get_growth_stage_batch(crop_types: List[str], days_after_sowing: List[int]) -> List[str]:
+    """
+    Determine growth stages for many samples with one searchsorted per crop
+    
+    Args:
+        crop_types: Crop type per sample
+        days_after_sowing: Days since sowing per sample
+    
+    Returns:
+        Growth stage name per sample
+    """
+    crops = np.array([crop_type.lower() for crop_type in crop_types], dtype=object)
+    days = np.asarray(days_after_sowing)
+    stages = np.full(len(crops), 'unknown', dtype=object)
     
-    for (min_days, max_days), stage in stages.items():
-        if min_days <= days_after_sowing <= max_days:
-            return stage
+    for crop, (bounds, names) in _STAGE_BOUNDS.items():
+        mask = crops == crop
+        if mask.any():
+            stages[mask] = np.array(names, dtype=object)[np.searchsorted(bounds, days[mask])]
     
-    return 'post_maturity'
+    return stages.tolist()
 
 
 def encode_season(season: str) -> int:
@@ -115,8 +223,10 @@ def encode_season(season: str) -> int:
     Returns:
         Encoded season value (0, 1, or 2)
     """
-    season_lower = season.lower()
-    return SEASON_ENCODING.get(season_lower, 0)
+    encoded = _SEASON_LOOKUP.get(season)
+    if encoded is None:
+        encoded = SEASON_ENCODING.get(season.lower(), 0)
+    return encoded
 
 
 def get_soil_retention_factor(soil_type: str) -> float:
@@ -129,8 +239,10 @@ def get_soil_retention_factor(soil_type: str) -> float:
     Returns:
         Water retention factor (0-1)
     """
-    soil_lower = soil_type.lower().replace(' ', '_')
-    return SOIL_WATER_RETENTION.get(soil_lower, 0.30)
+    retention = _SOIL_RETENTION_LOOKUP.get(soil_type)
+    if retention is None:
+        retention = SOIL_WATER_RETENTION.get(soil_type.lower().replace(' ', '_'), 0.30)
+    return retention
 
 
 def compute_weather_features(weather_data: Dict[str, Any]) -> Dict[str, float]:
@@ -152,16 +264,37 @@ def compute_weather_features(weather_data: Dict[str, Any]) -> Dict[str, float]:
     
     # Normalize features (using reasonable ranges)
     normalized = {
-        'avg_temp_norm': np.clip((avg_temp - 15) / 30, 0, 1),  # 15-45°C range
-        'rainfall_norm': np.clip(rainfall / 100, 0, 1),  # 0-100mm range
-        'rolling_rainfall_norm': np.clip(rolling_7day_rainfall / 200, 0, 1),  # 0-200mm range
-        'dry_days_norm': np.clip(consecutive_dry_days / 14, 0, 1),  # 0-14 days range
-        'temp_deviation_norm': np.clip((temp_deviation + 10) / 20, 0, 1)  # -10 to +10°C range
+        'avg_temp_norm': _clip01((avg_temp - 15) / 30),  # 15-45°C range
+        'rainfall_norm': _clip01(rainfall / 100),  # 0-100mm range
+        'rolling_rainfall_norm': _clip01(rolling_7day_rainfall / 200),  # 0-200mm range
+        'dry_days_norm': _clip01(consecutive_dry_days / 14),  # 0-14 days range
+        'temp_deviation_norm': _clip01((temp_deviation + 10) / 20)  # -10 to +10°C range
     }
     
     return normalized
 
 
+def compute_weather_features_batch(weather_batch: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Compute normalized weather features for many samples at once
+    
+    Args:
+        weather_batch: List of weather parameter dicts
+    
+    Returns:
+        Array of shape (N, 5), columns ordered as WEATHER_FEATURE_NAMES
+    """
+    raw = np.array(
+        [
+            [weather_data.get(key, default) for key, default, _, _ in WEATHER_NORMALIZATION]
+            for weather_data in weather_batch
+        ],
+        dtype=np.float64
+    ).reshape(-1, len(WEATHER_NORMALIZATION))
+    
+    return np.clip((raw - _WEATHER_OFFSETS) / _WEATHER_SCALES, 0, 1)
+
+
 def compute_stress_indicators(
     crop_type: str,
     growth_stage: str,
@@ -187,18 +320,16 @@ def compute_stress_indicators(
     rainfall_deficit = 1.0 - weather_features['rolling_rainfall_norm']
     soil_factor = 1.0 - soil_retention
     
-    indicators['moisture_stress'] = np.clip(
-        (dry_days * 0.4 + rainfall_deficit * 0.4 + soil_factor * 0.2),
-        0, 1
+    indicators['moisture_stress'] = _clip01(
+        dry_days * 0.4 + rainfall_deficit * 0.4 + soil_factor * 0.2
     )
     
     # Heat stress indicator
     temp_level = weather_features['avg_temp_norm']
     temp_deviation = weather_features['temp_deviation_norm']
     
-    indicators['heat_stress'] = np.clip(
-        (temp_level * 0.6 + temp_deviation * 0.4),
-        0, 1
+    indicators['heat_stress'] = _clip01(
+        temp_level * 0.6 + temp_deviation * 0.4
     )
     
     # Waterlogging indicator
@@ -206,39 +337,73 @@ def compute_stress_indicators(
     rolling_rainfall = weather_features['rolling_rainfall_norm']
     drainage_factor = soil_retention  # Clay retains more water
     
-    indicators['waterlogging'] = np.clip(
-        (recent_rainfall * 0.3 + rolling_rainfall * 0.5 + drainage_factor * 0.2),
-        0, 1
+    indicators['waterlogging'] = _clip01(
+        recent_rainfall * 0.3 + rolling_rainfall * 0.5 + drainage_factor * 0.2
     )
     
     return indicators
 
 
-def engineer_features(input_data: Dict[str, Any]) -> Dict[str, Any]:
+def compute_stress_indicators_batch(
+    weather_features: np.ndarray,
+    soil_retention: np.ndarray
+) -> np.ndarray:
     """
-    Main feature engineering pipeline
+    Compute stress indicator scores for many samples at once
+    
+    Same weights as compute_stress_indicators, applied column-wise.
     
     Args:
-        input_data: Raw input data
+        weather_features: (N, 5) array from compute_weather_features_batch
+        soil_retention: (N,) soil water retention factors
     
     Returns:
-        Engineered features ready for ML model
+        Array of shape (N, 3): moisture_stress, heat_stress, waterlogging
     """
-    # Extract inputs
-    crop_type = input_data.get('crop_type', 'wheat')
-    sowing_date = input_data.get('sowing_date')
-    soil_type = input_data.get('soil_type', 'loam')
-    season = input_data.get('season', 'monsoon')
-    weather_data = input_data.get('weather', {})
+    temp_level, recent_rainfall, rolling_rainfall, dry_days, temp_deviation = weather_features.T
     
+    indicators = np.empty((weather_features.shape[0], 3))
+    indicators[:, 0] = dry_days * 0.4 + (1.0 - rolling_rainfall) * 0.4 + (1.0 - soil_retention) * 0.2
+    indicators[:, 1] = temp_level * 0.6 + temp_deviation * 0.4
+    indicators[:, 2] = recent_rainfall * 0.3 + rolling_rainfall * 0.5 + soil_retention * 0.2
+    
+    return np.clip(indicators, 0, 1, out=indicators)
+
+
+@lru_cache(maxsize=4096)
+def _engineer_cached(
+    crop_type: str,
+    days_after_sowing: int,
+    soil_type: str,
+    season: str,
+    avg_temp: float,
+    rainfall: float,
+    rolling_7day_rainfall: float,
+    consecutive_dry_days: int,
+    temp_deviation: float
+) -> FeatureVec:
+    """
+    Cached core of engineer_features, keyed on the extracted raw inputs
+    
+    days_after_sowing is part of the key, so entries naturally expire as
+    the calendar day changes.
+    
+    Returns:
+        Engineered features (shared between cache hits; immutable)
+    """
     # Compute derived features
-    days_after_sowing = compute_days_after_sowing(sowing_date)
     growth_stage = get_growth_stage(crop_type, days_after_sowing)
     season_encoded = encode_season(season)
     soil_retention = get_soil_retention_factor(soil_type)
     
     # Compute weather features
-    weather_features = compute_weather_features(weather_data)
+    weather_features = compute_weather_features({
+        'avg_temp': avg_temp,
+        'rainfall': rainfall,
+        'rolling_7day_rainfall': rolling_7day_rainfall,
+        'consecutive_dry_days': consecutive_dry_days,
+        'temp_deviation_from_normal': temp_deviation
+    })
     
     # Compute stress indicators
     stress_indicators = compute_stress_indicators(
@@ -248,17 +413,128 @@ def engineer_features(input_data: Dict[str, Any]) -> Dict[str, Any]:
         soil_retention
     )
     
-    # Package features
-    features = {
-        'crop_type': crop_type,
-        'days_after_sowing': days_after_sowing,
-        'growth_stage': growth_stage,
-        'season_encoded': season_encoded,
-        'season': season,
-        'soil_type': soil_type,
-        'soil_retention': soil_retention,
+    return FeatureVec(
+        crop_type=crop_type,
+        days_after_sowing=days_after_sowing,
+        growth_stage=growth_stage,
+        season_encoded=season_encoded,
+        season=season,
+        soil_type=soil_type,
+        soil_retention=soil_retention,
         **weather_features,
         **stress_indicators
+    )
+
+
+def feature_key(input_data: Dict[str, Any]) -> tuple:
+    """
+    Canonical key of the raw values engineered features depend on
+    
+    Uses days_after_sowing rather than sowing_date, so keys built on
+    different calendar days differ.
+    
+    Args:
+        input_data: Raw input data
+    
+    Returns:
+        (crop_type, days_after_sowing, soil_type, season, *weather values)
+    """
+    # Extract inputs; categorical values from JSON are fresh strings, so
+    # intern them to make later dict-key and == checks identity compares
+    crop_type = sys.intern(input_data.get('crop_type', 'wheat'))
+    sowing_date = input_data.get('sowing_date')
+    soil_type = sys.intern(input_data.get('soil_type', 'loam'))
+    season = sys.intern(input_data.get('season', 'monsoon'))
+    weather_data = input_data.get('weather', {})
+    
+    return (
+        crop_type,
+        compute_days_after_sowing(sowing_date),
+        soil_type,
+        season,
+        *(weather_data.get(key, default) for key, default, _, _ in WEATHER_NORMALIZATION)
+    )
+
+
+def engineer_features_from_key(key: tuple) -> FeatureVec:
+    """
+    Feature engineering for a key built by feature_key
+    
+    Args:
+        key: Output of feature_key
+    
+    Returns:
+        Engineered features ready for ML model
+    """
+    return _engineer_cached(*key)
+
+
+def engineer_features(input_data: Dict[str, Any]) -> FeatureVec:
+    """
+    Main feature engineering pipeline
+    
+    Args:
+        input_data: Raw input data
+    
+    Returns:
+        Engineered features ready for ML model
+    """
+    return _engineer_cached(*feature_key(input_data))
+
+
+def engineer_features_batch(input_batch: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Feature engineering pipeline for a batch of inputs
+    
+    Features are returned struct-of-arrays: one 1D array per feature name
+    (object arrays for the string fields), computed with array operations
+    over the whole batch. Row i matches engineer_features(input_batch[i]).
+    
+    Args:
+        input_batch: List of raw input data dicts
+    
+    Returns:
+        Dict of feature name -> array of length N
+    """
+    crop_types = [sys.intern(input_data.get('crop_type', 'wheat')) for input_data in input_batch]
+    soil_types = [sys.intern(input_data.get('soil_type', 'loam')) for input_data in input_batch]
+    seasons = [sys.intern(input_data.get('season', 'monsoon')) for input_data in input_batch]
+    today = date.today()
+    days = [compute_days_after_sowing(input_data.get('sowing_date'), today) for input_data in input_batch]
+    growth_stages = get_growth_stage_batch(crop_types, days)
+    soil_retention = np.array([get_soil_retention_factor(soil_type) for soil_type in soil_types], dtype=np.float64)
+    
+    weather = compute_weather_features_batch([input_data.get('weather', {}) for input_data in input_batch])
+    indicators = compute_stress_indicators_batch(weather, soil_retention)
+    
+    # Transpose once so every feature column is contiguous
+    weather = np.ascontiguousarray(weather.T)
+    indicators = np.ascontiguousarray(indicators.T)
+    
+    return {
+        'crop_type': np.array(crop_types, dtype=object),
+        'days_after_sowing': np.array(days, dtype=np.int64),
+        'growth_stage': np.array(growth_stages, dtype=object),
+        'season_encoded': np.array([encode_season(season) for season in seasons], dtype=np.int64),
+        'season': np.array(seasons, dtype=object),
+        'soil_type': np.array(soil_types, dtype=object),
+        'soil_retention': soil_retention,
+        **dict(zip(WEATHER_FEATURE_NAMES, weather)),
+        'moisture_stress': indicators[0],
+        'heat_stress': indicators[1],
+        'waterlogging': indicators[2]
     }
+
+
+def split_feature_rows(features: Dict[str, np.ndarray]) -> List[FeatureVec]:
+    """
+    Convert struct-of-arrays batch features into per-sample FeatureVecs
+    
+    Args:
+        features: Output of engineer_features_batch
     
-    return features
+    Returns:
+        List of engineered features with plain Python values
+    """
+    columns = [features[name].tolist() for name in FeatureVec._fields]
+    return [FeatureVec._make(row) for row in zip(*columns)]
@@ -3,9 +3,82 @@ ML Model Module
 Lightweight ML using Random Forest for stress prediction
 """
 
+import logging
+import os
+import pickle
+import threading
+import joblib
 import numpy as np
-from typing import Dict, Tuple
-from sklearn.ensemble import RandomForestClassifier
+from typing import Any, Dict, Optional, Tuple
+from numba import njit
+
+from .feature_engineering import FeatureVec
+from .stress_types import STRESS_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+@njit(cache=True, nogil=True)
+def _forest_predict_proba(x, feats, thresh, left, right, leaf_probs, out):
+    """
+    Average leaf class probabilities over all trees for one sample
+    
+    Args:
+        x: Feature vector (float32, same cast sklearn applies)
+        feats, thresh, left, right: Per-tree node arrays, shape (n_trees, max_nodes);
+            leaves store ~leaf_id in left
+        leaf_probs: Normalized class probabilities, shape (n_trees, max_leaves, n_classes)
+        out: Preallocated (n_classes,) float64 buffer that receives the probabilities
+    
+    Returns:
+        Index of the most probable class
+    """
+    n_trees = feats.shape[0]
+    out[:] = 0.0
+    
+    for t in range(n_trees):
+        n = 0
+        while left[t, n] >= 0:
+            if x[feats[t, n]] <= thresh[t, n]:
+                n = left[t, n]
+            else:
+                n = right[t, n]
+        out += leaf_probs[t, ~left[t, n]]
+    
+    out /= n_trees
+    return out.argmax()
+
+
+@njit(cache=True, nogil=True)
+def _forest_predict_proba_batch(X, feats, thresh, left, right, leaf_probs):
+    """
+    Row-wise forest probabilities for a (N, n_features) float32 matrix
+    
+    Returns:
+        Class probability matrix, shape (N, n_classes)
+    """
+    probs = np.empty((X.shape[0], leaf_probs.shape[2]))
+    
+    for i in range(X.shape[0]):
+        _forest_predict_proba(X[i], feats, thresh, left, right, leaf_probs, probs[i])
+    
+    return probs
+
+
+# Prebuilt model artifact (see build_model.py)
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'stress_model.joblib')
+
+# Bump when the artifact layout or training setup changes
+MODEL_FORMAT_VERSION = 5
+
+# Compiled forest arrays persisted alongside the sklearn estimator
+_FOREST_ARRAYS = (
+    '_tree_feature',
+    '_tree_threshold',
+    '_tree_left',
+    '_tree_right',
+    '_leaf_probs'
+)
 
 
 class StressMLModel:
@@ -16,8 +89,16 @@ class StressMLModel:
     In production, train on historical data with labels.
     """
     
-    def __init__(self):
-        self.model = None
+    def __init__(self, model_path: Optional[str] = MODEL_PATH):
+        """
+        Args:
+            model_path: Prebuilt artifact to load; the model is trained in
+                process when this is None or the file is missing/stale
+        """
+        self._model = None
+        self._model_pickle = None
+        self.model_info = None
+        self._local = threading.local()
         self.feature_names = [
             'days_after_sowing',
             'season_encoded',
@@ -32,8 +113,80 @@ class StressMLModel:
             'waterlogging'
         ]
         
-        # Initialize with rule-based weights (simulating trained model)
-        self._initialize_model()
+        if model_path is not None and not self.load(model_path):
+            logger.warning(
+                "Model artifact %s is missing or stale; training in process "
+                "(run `python build_model.py` to build it)", model_path
+            )
+        
+        if not self.is_loaded:
+            # Initialize with rule-based weights (simulating trained model)
+            self._initialize_model()
+        
+        # Warm up so the first request doesn't pay JIT compilation
+        self._predict_proba(np.zeros(len(self.feature_names), dtype=np.float32))
+        self.predict_batch(np.zeros((0, len(self.feature_names)), dtype=np.float32))
+    
+    @property
+    def model(self):
+        """
+        The fitted sklearn estimator
+        
+        Prediction never needs it, so after load() it stays pickled (and
+        sklearn unimported) until something like to_onnx() asks for it.
+        """
+        if self._model is None and self._model_pickle is not None:
+            self._model = pickle.loads(self._model_pickle)
+        return self._model
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Whether a fitted forest is ready for prediction"""
+        return self.model_info is not None
+    
+    def save(self, path: str = MODEL_PATH):
+        """
+        Persist the fitted model and its compiled forest arrays
+        
+        Stored uncompressed so load() can memory-map the arrays.
+        
+        Args:
+            path: Destination file
+        """
+        joblib.dump({
+            'version': MODEL_FORMAT_VERSION,
+            'model': pickle.dumps(self.model, protocol=pickle.HIGHEST_PROTOCOL),
+            'model_info': self.model_info,
+            'forest': {name: getattr(self, name) for name in _FOREST_ARRAYS}
+        }, path)
+    
+    def load(self, path: str = MODEL_PATH) -> bool:
+        """
+        Load a prebuilt artifact written by save()
+        
+        Forest arrays are memory-mapped read-only, so forked workers share
+        the same pages instead of each holding a copy.
+        
+        Args:
+            path: Artifact file
+        
+        Returns:
+            True if the artifact was loaded, False if missing or stale
+        """
+        if not os.path.exists(path):
+            return False
+        
+        state = joblib.load(path, mmap_mode='r')
+        if state.get('version') != MODEL_FORMAT_VERSION:
+            return False
+        
+        self._model = None
+        self._model_pickle = state['model']
+        self.model_info = state['model_info']
+        for name in _FOREST_ARRAYS:
+            setattr(self, name, state['forest'][name])
+        
+        return True
     
     def _initialize_model(self):
         """
@@ -79,16 +232,126 @@ class StressMLModel:
             X_train.append(features)
             y_train.append(label)
         
-        # Train Random Forest
-        self.model = RandomForestClassifier(
-            n_estimators=50,
-            max_depth=10,
+        from sklearn.ensemble import RandomForestClassifier
+        
+        # Train Random Forest; the synthetic labels are simple threshold
+        # rules, so a small shallow forest learns them as well as a large one
+        self._model = RandomForestClassifier(
+            n_estimators=20,
+            max_depth=6,
             random_state=42,
-            class_weight='balanced'
+            class_weight='balanced',
+            n_jobs=1  # Parallelism comes from the API threadpool, not sklearn
+        )
+        self._model.fit(X_train, y_train)
+        self._model_pickle = None
+        
+        self._compile_forest()
+        self.model_info = self._build_model_info()
+    
+    def _build_model_info(self) -> Dict[str, Any]:
+        """
+        Static metadata for the fitted model, computed once after training
+        
+        Returns:
+            Model metadata served by /api/model/info
+        """
+        feature_importance = dict(zip(self.feature_names, self.model.feature_importances_.tolist()))
+        
+        return {
+            "model_type": "Random Forest Classifier",
+            "n_estimators": self.model.n_estimators,
+            "max_depth": self.model.max_depth,
+            "features": list(feature_importance.keys()),
+            "feature_importance": feature_importance,
+            "stress_types": list(STRESS_TYPES)
+        }
+    
+    def _compile_forest(self):
+        """
+        Flatten fitted trees into padded node arrays for the jitted traversal
+        
+        Nodes are stored struct-of-arrays with narrow dtypes (int8 feature,
+        int16 children, float32 threshold/probabilities) so the whole forest
+        stays cache resident, instead of sklearn's ~64 byte node structs.
+        Class probabilities are only kept for leaves: a leaf's left child
+        slot holds ~leaf_id, its row in the leaf table.
+        """
+        trees = [est.tree_ for est in self.model.estimators_]
+        n_trees = len(trees)
+        max_nodes = max(tree.node_count for tree in trees)
+        max_leaves = max(tree.n_leaves for tree in trees)
+        n_classes = len(self.model.classes_)
+        
+        # numpy wraps out-of-range values silently on the narrowing copies
+        # below, so a bigger forest must fail here instead
+        node_limit = np.iinfo(np.int16)
+        if max_nodes > node_limit.max:
+            raise ValueError(f"Tree with {max_nodes} nodes does not fit int16 node ids")
+        if ~(max_leaves - 1) < node_limit.min:
+            raise ValueError(f"Tree with {max_leaves} leaves does not fit int16 leaf ids (~leaf_id)")
+        if self.model.n_features_in_ > np.iinfo(np.int8).max:
+            raise ValueError(f"{self.model.n_features_in_} features do not fit int8 feature ids")
+        
+        self._tree_feature = np.zeros((n_trees, max_nodes), dtype=np.int8)
+        self._tree_threshold = np.zeros((n_trees, max_nodes), dtype=np.float32)
+        self._tree_left = np.full((n_trees, max_nodes), -1, dtype=np.int16)
+        self._tree_right = np.full((n_trees, max_nodes), -1, dtype=np.int16)
+        self._leaf_probs = np.zeros((n_trees, max_leaves, n_classes), dtype=np.float32)
+        
+        for t, tree in enumerate(trees):
+            n = tree.node_count
+            leaves = np.flatnonzero(tree.children_left == -1)
+            self._tree_feature[t, :n] = tree.feature
+            self._tree_left[t, :n] = tree.children_left
+            self._tree_left[t, leaves] = ~np.arange(len(leaves))
+            self._tree_right[t, :n] = tree.children_right
+            
+            # Round thresholds down to the nearest float32 so that, for the
+            # float32 inputs sklearn compares against them, x <= thr32
+            # holds exactly when x <= thr64
+            threshold = tree.threshold.astype(np.float32)
+            rounded_up = threshold > tree.threshold
+            threshold[rounded_up] = np.nextafter(threshold[rounded_up], np.float32(-np.inf))
+            self._tree_threshold[t, :n] = threshold
+            
+            # Same per-node normalization sklearn's tree predict_proba applies
+            value = tree.value[leaves, 0, :]
+            self._leaf_probs[t, :len(leaves)] = value / value.sum(axis=1, keepdims=True)
+    
+    def _probs_buffer(self) -> np.ndarray:
+        """
+        Per-thread output buffer for single-row predictions
+        
+        Requests run concurrently in the API threadpool, so each thread
+        reuses its own buffer instead of allocating one per call.
+        """
+        probs = getattr(self._local, 'probs', None)
+        if probs is None:
+            probs = self._local.probs = np.empty(self._leaf_probs.shape[2])
+        return probs
+    
+    def _predict_proba(self, x: np.ndarray) -> Tuple[int, np.ndarray]:
+        """
+        Class probabilities for a single float32 feature vector
+        
+        Returns:
+            (top class index, probabilities); the probabilities live in the
+            calling thread's buffer and are overwritten by its next call
+        """
+        probs = self._probs_buffer()
+        max_idx = _forest_predict_proba(
+            x,
+            self._tree_feature,
+            self._tree_threshold,
+            self._tree_left,
+            self._tree_right,
+            self._leaf_probs,
+            probs
         )
-        self.model.fit(X_train, y_train)
+        return max_idx, probs
     
-    def predict(self, features: Dict[str, float]) -> Tuple[str, float]:
+    def predict(self, features: FeatureVec) -> Tuple[str, float]:
         """
         Predict stress type and confidence
         
@@ -97,35 +360,101 @@ class StressMLModel:
         
         Returns:
             (stress_type, confidence_score)
+        
+        Raises:
+            ValueError: If a feature is NaN or infinite
         """
         # Extract feature vector
-        X = np.array([[
-            features['days_after_sowing'],
-            features['season_encoded'],
-            features['soil_retention'],
-            features['avg_temp_norm'],
-            features['rainfall_norm'],
-            features['rolling_rainfall_norm'],
-            features['dry_days_norm'],
-            features['temp_deviation_norm'],
-            features['moisture_stress'],
-            features['heat_stress'],
-            features['waterlogging']
-        ]])
-        
-        # Get prediction probabilities
-        probs = self.model.predict_proba(X)[0]
-        
-        # Map to stress types
-        stress_types = ['moisture_stress', 'heat_stress', 'waterlogging', 'no_stress']
-        
-        # Get top prediction
-        max_idx = np.argmax(probs)
-        stress_type = stress_types[max_idx]
+        x = np.array([
+            features.days_after_sowing,
+            features.season_encoded,
+            features.soil_retention,
+            features.avg_temp_norm,
+            features.rainfall_norm,
+            features.rolling_rainfall_norm,
+            features.dry_days_norm,
+            features.temp_deviation_norm,
+            features.moisture_stress,
+            features.heat_stress,
+            features.waterlogging
+        ], dtype=np.float32)
+        
+        # The compiled forest, unlike sklearn, does not validate its input
+        if not np.isfinite(x).all():
+            raise ValueError("Input features contain NaN or infinity")
+        
+        # Get prediction probabilities and top prediction
+        max_idx, probs = self._predict_proba(x)
+        stress_type = STRESS_TYPES[max_idx]
         confidence = float(probs[max_idx])
         
         return stress_type, confidence
     
+    def feature_matrix(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Stack struct-of-arrays batch features into the model's input matrix
+        
+        Args:
+            features: Feature name -> array of length N
+        
+        Returns:
+            (N, 11) float32 matrix in feature_names order
+        """
+        return np.column_stack(
+            [features[name] for name in self.feature_names]
+        ).astype(np.float32).reshape(-1, len(self.feature_names))
+    
+    def predict_batch(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict stress class and confidence for many samples in one forest pass
+        
+        Args:
+            X: (N, 11) float32 feature matrix, see feature_matrix()
+        
+        Returns:
+            (class indices into STRESS_TYPES, confidence scores), both length N
+        
+        Raises:
+            ValueError: If a feature is NaN or infinite
+        """
+        if not np.isfinite(X).all():
+            raise ValueError("Input features contain NaN or infinity")
+        
+        probs = _forest_predict_proba_batch(
+            X,
+            self._tree_feature,
+            self._tree_threshold,
+            self._tree_left,
+            self._tree_right,
+            self._leaf_probs
+        )
+        
+        max_idx = probs.argmax(axis=1)
+        confidences = probs[np.arange(len(max_idx)), max_idx]
+        
+        return max_idx, confidences
+    
+    def to_onnx(self) -> bytes:
+        """
+        Export the fitted forest as a serialized ONNX model
+        
+        Requires skl2onnx. The exported graph takes a float32 'X' input of
+        shape (N, 11) and emits plain probability tensors (no ZipMap), so it
+        can be served by onnxruntime outside this process.
+        
+        Returns:
+            Serialized ONNX model bytes
+        """
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+        
+        onnx_model = convert_sklearn(
+            self.model,
+            initial_types=[('X', FloatTensorType([None, len(self.feature_names)]))],
+            options={id(self.model): {'zipmap': False}}
+        )
+        return onnx_model.SerializeToString()
+    
     def get_feature_importance(self) -> Dict[str, float]:
         """
         Get feature importance scores
@@ -133,5 +462,4 @@ class StressMLModel:
         Returns:
             Feature importance dictionary
         """
-        importances = self.model.feature_importances_
-        return dict(zip(self.feature_names, importances))
+        return dict(self.model_info['feature_importance'])
@@ -3,55 +3,189 @@ Rule Engine Module
 Validate ML predictions using agronomic rules
 """
 
-from typing import Dict, Tuple
+import numpy as np
+from enum import IntEnum
+from typing import Tuple
+
+from .feature_engineering import GROWTH_STAGES, FeatureVec
+from .severity import SEVERITY_COLORS, SEVERITY_LEVELS, severity_level
 
 
 # Critical growth stages for each crop
 CRITICAL_STAGES = {
-    'wheat': ['flowering', 'grain_filling'],
-    'rice': ['flowering', 'grain_filling'],
-    'maize': ['flowering', 'grain_filling'],
-    'cotton': ['flowering', 'boll_development']
+    'wheat': frozenset({'flowering', 'grain_filling'}),
+    'rice': frozenset({'flowering', 'grain_filling'}),
+    'maize': frozenset({'flowering', 'grain_filling'}),
+    'cotton': frozenset({'flowering', 'boll_development'})
 }
 
+_EMPTY = frozenset()
 
-def validate_moisture_stress(features: Dict, confidence: float) -> Tuple[str, float, str]:
-    """
-    Validate moisture stress prediction
-    
-    Args:
-        features: Engineered features
-        confidence: ML model confidence
-    
-    Returns:
-        (validated_stress_type, adjusted_confidence, reason)
-    """
-    dry_days = features['dry_days_norm']
-    rainfall = features['rolling_rainfall_norm']
-    moisture_indicator = features['moisture_stress']
-    growth_stage = features['growth_stage']
-    crop_type = features['crop_type']
+# Integer codes for crops and growth stages; UNKNOWN_* stands for any
+# crop / stage not listed (never critical)
+CROP_CODES = {crop: code for code, crop in enumerate(CRITICAL_STAGES)}
+STAGE_CODES = {
+    stage: code
+    for code, stage in enumerate(dict.fromkeys(
+        [stage for stages in GROWTH_STAGES.values() for stage in stages.values()]
+        + ['post_maturity', 'unknown']
+    ))
+}
+UNKNOWN_CROP = len(CROP_CODES)
+UNKNOWN_STAGE = len(STAGE_CODES)
+
+# CRITICAL[crop_code, stage_code] is True for the critical stages above;
+# array kernels use it in place of CRITICAL_STAGES
+CRITICAL = np.zeros((UNKNOWN_CROP + 1, UNKNOWN_STAGE + 1), dtype=np.bool_)
+for _crop, _stages in CRITICAL_STAGES.items():
+    for _stage in _stages:
+        CRITICAL[CROP_CODES[_crop], STAGE_CODES[_stage]] = True
+
+
+# Validator rule thresholds; RULES_BY_CROP holds the values each crop's
+# validators are generated with (unlisted crops use the defaults)
+DEFAULT_THRESHOLDS = {
+    # moisture_stress
+    'dry_high': 0.7,
+    'rain_low': 0.2,
+    'moisture_high': 0.6,
+    'moisture_floor': 0.85,
+    'moisture_critical': 0.5,
+    'moisture_boost': 1.2,
+    'moisture_cap': 0.95,
+    'rain_sufficient': 0.5,
+    'dry_low': 0.3,
+    # heat_stress
+    'temp_high': 0.8,
+    'temp_dev_high': 0.7,
+    'heat_floor': 0.85,
+    'heat_critical': 0.6,
+    'heat_boost': 1.15,
+    'heat_cap': 0.95,
+    'temp_low': 0.5,
+    'temp_dev_low': 0.4,
+    # waterlogging
+    'rolling_rain_high': 0.7,
+    'poor_drainage': 0.35,
+    'water_floor': 0.80,
+    'good_drainage': 0.20,
+    'recent_rain_high': 0.8,
+    'recent_rolling_rain': 0.6,
+    'water_boost': 1.1,
+    'water_cap': 0.90,
+    'rolling_rain_low': 0.3
+}
+
+RULES_BY_CROP = {crop: dict(DEFAULT_THRESHOLDS) for crop in CRITICAL_STAGES}
+
+# THRESHOLDS[crop_code, Threshold.X.value] for array kernels (numba
+# does not accept IntEnum members as array indices)
+Threshold = IntEnum('Threshold', [name.upper() for name in DEFAULT_THRESHOLDS], start=0)
+THRESHOLDS = np.array(
+    [[RULES_BY_CROP[crop][name] for name in DEFAULT_THRESHOLDS] for crop in CROP_CODES]
+    + [list(DEFAULT_THRESHOLDS.values())],
+    dtype=np.float64
+)
+
+# Validator source with thresholds and the crop's critical stages filled in,
+# so each crop gets functions whose comparisons are against constants.
+# Rule order is part of the semantics: the rules can overlap (e.g. a
+# critical-stage moisture sample with sufficient rainfall), so the first
+# match wins. The false positive filters are also the rarest outcome,
+# since the model seldom predicts a stress its own inputs rule out.
+_VALIDATOR_SOURCE = """
+def validate_moisture_stress(features, confidence):
+    dry_days = features.dry_days_norm
+    rainfall = features.rolling_rainfall_norm
+    moisture_indicator = features.moisture_stress
     
     # Rule 1: High confidence if clear indicators
-    if dry_days > 0.7 and rainfall < 0.2 and moisture_indicator > 0.6:
-        return 'moisture_stress', max(confidence, 0.85), 'high_dry_period'
+    if dry_days > {dry_high!r} and rainfall < {rain_low!r} and moisture_indicator > {moisture_high!r}:
+        return 'moisture_stress', max(confidence, {moisture_floor!r}), 'high_dry_period'
     
     # Rule 2: Critical stage amplification
-    if growth_stage in CRITICAL_STAGES.get(crop_type, []):
-        if moisture_indicator > 0.5:
-            adjusted_conf = min(confidence * 1.2, 0.95)
-            return 'moisture_stress', adjusted_conf, 'critical_stage'
+    if features.growth_stage in {critical}:
+        if moisture_indicator > {moisture_critical!r}:
+            return 'moisture_stress', min(confidence * {moisture_boost!r}, {moisture_cap!r}), 'critical_stage'
     
     # Rule 3: False positive filter
-    if rainfall > 0.5 and dry_days < 0.3:
+    if rainfall > {rain_sufficient!r} and dry_days < {dry_low!r}:
         return 'no_stress', 0.0, 'sufficient_rainfall'
     
     return 'moisture_stress', confidence, 'validated'
 
 
-def validate_heat_stress(features: Dict, confidence: float) -> Tuple[str, float, str]:
+def validate_heat_stress(features, confidence):
+    temp = features.avg_temp_norm
+    temp_dev = features.temp_deviation_norm
+    
+    # Rule 1: Strong heat signal
+    if temp > {temp_high!r} and temp_dev > {temp_dev_high!r}:
+        return 'heat_stress', max(confidence, {heat_floor!r}), 'extreme_heat'
+    
+    # Rule 2: Critical stage sensitivity
+    if features.growth_stage in {critical}:
+        if features.heat_stress > {heat_critical!r}:
+            return 'heat_stress', min(confidence * {heat_boost!r}, {heat_cap!r}), 'critical_stage_heat'
+    
+    # Rule 3: False positive filter
+    if temp < {temp_low!r} and temp_dev < {temp_dev_low!r}:
+        return 'no_stress', 0.0, 'normal_temperature'
+    
+    return 'heat_stress', confidence, 'validated'
+
+
+def validate_waterlogging(features, confidence):
+    rainfall = features.rainfall_norm
+    rolling_rain = features.rolling_rainfall_norm
+    soil_retention = features.soil_retention
+    
+    # Rule 1: Heavy rain + poor drainage
+    if rolling_rain > {rolling_rain_high!r} and soil_retention > {poor_drainage!r}:
+        return 'waterlogging', max(confidence, {water_floor!r}), 'heavy_rainfall_poor_drainage'
+    
+    # Rule 2: Sandy soil reduces waterlogging risk
+    if soil_retention < {good_drainage!r}:
+        return 'no_stress', 0.0, 'good_drainage'
+    
+    # Rule 3: Recent heavy rain
+    if rainfall > {recent_rain_high!r} and rolling_rain > {recent_rolling_rain!r}:
+        return 'waterlogging', min(confidence * {water_boost!r}, {water_cap!r}), 'recent_heavy_rain'
+    
+    # Rule 4: False positive filter
+    if rolling_rain < {rolling_rain_low!r}:
+        return 'no_stress', 0.0, 'insufficient_rainfall'
+    
+    return 'waterlogging', confidence, 'validated'
+"""
+
+
+def _generate_validators(thresholds: dict, critical_stages: frozenset) -> dict:
     """
-    Validate heat stress prediction
+    Generate stress type -> validator functions specialized to one crop
+    
+    Args:
+        thresholds: Rule thresholds (DEFAULT_THRESHOLDS keys)
+        critical_stages: The crop's critical growth stages
+    
+    Returns:
+        Dict of stress type -> validate(features, confidence)
+    """
+    # A set display of string literals compiles to a frozenset constant;
+    # an empty tuple keeps the membership test valid for crops without any
+    critical = '{' + ', '.join(map(repr, sorted(critical_stages))) + '}' if critical_stages else '()'
+    namespace = {}
+    exec(_VALIDATOR_SOURCE.format(critical=critical, **thresholds), namespace)
+    
+    return {
+        stress_type: namespace[f'validate_{stress_type}']
+        for stress_type in ('moisture_stress', 'heat_stress', 'waterlogging')
+    }
+
+
+def validate_no_stress(features: FeatureVec, confidence: float) -> Tuple[str, float, str]:
+    """
+    Validate no-stress prediction (override if any indicator is critically high)
     
     Args:
         features: Engineered features
@@ -60,32 +194,31 @@ def validate_heat_stress(features: Dict, confidence: float) -> Tuple[str, float,
     Returns:
         (validated_stress_type, adjusted_confidence, reason)
     """
-    temp = features['avg_temp_norm']
-    temp_dev = features['temp_deviation_norm']
-    heat_indicator = features['heat_stress']
-    growth_stage = features['growth_stage']
-    crop_type = features['crop_type']
+    # Checked in priority order: the first indicator above 0.8 wins, even
+    # if a later one is higher, so this is not an argmax
+    if features.moisture_stress > 0.8:
+        return 'moisture_stress', 0.75, 'rule_override_moisture'
     
-    # Rule 1: Strong heat signal
-    if temp > 0.8 and temp_dev > 0.7:
-        return 'heat_stress', max(confidence, 0.85), 'extreme_heat'
+    if features.heat_stress > 0.8:
+        return 'heat_stress', 0.75, 'rule_override_heat'
     
-    # Rule 2: Critical stage sensitivity
-    if growth_stage in CRITICAL_STAGES.get(crop_type, []):
-        if heat_indicator > 0.6:
-            adjusted_conf = min(confidence * 1.15, 0.95)
-            return 'heat_stress', adjusted_conf, 'critical_stage_heat'
-    
-    # Rule 3: False positive filter
-    if temp < 0.5 and temp_dev < 0.4:
-        return 'no_stress', 0.0, 'normal_temperature'
+    if features.waterlogging > 0.8:
+        return 'waterlogging', 0.75, 'rule_override_waterlogging'
     
-    return 'heat_stress', confidence, 'validated'
+    return 'no_stress', confidence, 'validated_no_stress'
+
+
+# Crop -> ML prediction -> validator; anything else is validated as no_stress
+_VALIDATORS_BY_CROP = {
+    crop: _generate_validators(RULES_BY_CROP[crop], CRITICAL_STAGES[crop])
+    for crop in CROP_CODES
+}
+_DEFAULT_VALIDATORS = _generate_validators(DEFAULT_THRESHOLDS, _EMPTY)
 
 
-def validate_waterlogging(features: Dict, confidence: float) -> Tuple[str, float, str]:
+def validate_moisture_stress(features: FeatureVec, confidence: float) -> Tuple[str, float, str]:
     """
-    Validate waterlogging prediction
+    Validate moisture stress prediction with the crop's rules
     
     Args:
         features: Engineered features
@@ -94,32 +227,41 @@ def validate_waterlogging(features: Dict, confidence: float) -> Tuple[str, float
     Returns:
         (validated_stress_type, adjusted_confidence, reason)
     """
-    rainfall = features['rainfall_norm']
-    rolling_rain = features['rolling_rainfall_norm']
-    soil_retention = features['soil_retention']
-    water_indicator = features['waterlogging']
-    
-    # Rule 1: Heavy rain + poor drainage
-    if rolling_rain > 0.7 and soil_retention > 0.35:
-        return 'waterlogging', max(confidence, 0.80), 'heavy_rainfall_poor_drainage'
+    validators = _VALIDATORS_BY_CROP.get(features.crop_type, _DEFAULT_VALIDATORS)
+    return validators['moisture_stress'](features, confidence)
+
+
+def validate_heat_stress(features: FeatureVec, confidence: float) -> Tuple[str, float, str]:
+    """
+    Validate heat stress prediction with the crop's rules
     
-    # Rule 2: Sandy soil reduces waterlogging risk
-    if soil_retention < 0.20:
-        return 'no_stress', 0.0, 'good_drainage'
+    Args:
+        features: Engineered features
+        confidence: ML model confidence
     
-    # Rule 3: Recent heavy rain
-    if rainfall > 0.8 and rolling_rain > 0.6:
-        adjusted_conf = min(confidence * 1.1, 0.90)
-        return 'waterlogging', adjusted_conf, 'recent_heavy_rain'
+    Returns:
+        (validated_stress_type, adjusted_confidence, reason)
+    """
+    validators = _VALIDATORS_BY_CROP.get(features.crop_type, _DEFAULT_VALIDATORS)
+    return validators['heat_stress'](features, confidence)
+
+
+def validate_waterlogging(features: FeatureVec, confidence: float) -> Tuple[str, float, str]:
+    """
+    Validate waterlogging prediction with the crop's rules
     
-    # Rule 4: False positive filter
-    if rolling_rain < 0.3:
-        return 'no_stress', 0.0, 'insufficient_rainfall'
+    Args:
+        features: Engineered features
+        confidence: ML model confidence
     
-    return 'waterlogging', confidence, 'validated'
+    Returns:
+        (validated_stress_type, adjusted_confidence, reason)
+    """
+    validators = _VALIDATORS_BY_CROP.get(features.crop_type, _DEFAULT_VALIDATORS)
+    return validators['waterlogging'](features, confidence)
 
 
-def apply_rules(features: Dict, ml_prediction: str, ml_confidence: float) -> Tuple[str, float, str]:
+def apply_rules(features: FeatureVec, ml_prediction: str, ml_confidence: float) -> Tuple[str, float, str]:
     """
     Apply rule-based validation to ML prediction
     
@@ -135,25 +277,32 @@ def apply_rules(features: Dict, ml_prediction: str, ml_confidence: float) -> Tup
     if ml_confidence < 0.45:
         return 'no_stress', 0.0, 'low_confidence'
     
-    # Apply stress-specific rules
-    if ml_prediction == 'moisture_stress':
-        return validate_moisture_stress(features, ml_confidence)
-    
-    elif ml_prediction == 'heat_stress':
-        return validate_heat_stress(features, ml_confidence)
-    
-    elif ml_prediction == 'waterlogging':
-        return validate_waterlogging(features, ml_confidence)
-    
-    else:  # no_stress
-        # Check if any stress indicator is critically high
-        if features['moisture_stress'] > 0.8:
-            return 'moisture_stress', 0.75, 'rule_override_moisture'
-        
-        if features['heat_stress'] > 0.8:
-            return 'heat_stress', 0.75, 'rule_override_heat'
-        
-        if features['waterlogging'] > 0.8:
-            return 'waterlogging', 0.75, 'rule_override_waterlogging'
-        
-        return 'no_stress', ml_confidence, 'validated_no_stress'
+    # Apply the crop's stress-specific rules
+    validators = _VALIDATORS_BY_CROP.get(features.crop_type, _DEFAULT_VALIDATORS)
+    return validators.get(ml_prediction, validate_no_stress)(features, ml_confidence)
+
+
+def classify_and_score(
+    features: FeatureVec,
+    ml_prediction: str,
+    ml_confidence: float
+) -> Tuple[str, float, str, str, str]:
+    """
+    Validate an ML prediction and compute its severity in one pass
+    
+    Equivalent to apply_rules followed by compute_severity, without the
+    intermediate (severity, color) tuple.
+    
+    Args:
+        features: Engineered features
+        ml_prediction: ML model prediction
+        ml_confidence: ML model confidence
+    
+    Returns:
+        (final_stress_type, final_confidence, validation_reason,
+         severity_level, severity_color)
+    """
+    stress_type, confidence, reason = apply_rules(features, ml_prediction, ml_confidence)
+    level = severity_level(stress_type, confidence, features)
+    
+    return stress_type, confidence, reason, SEVERITY_LEVELS[level], SEVERITY_COLORS[level]
@@ -0,0 +1,188 @@
+"""
+Rule Engine Kernel
+Batch rule validation compiled with Numba over struct-of-arrays features
+"""
+
+import numpy as np
+from enum import IntEnum
+from typing import Dict, Tuple
+from numba import njit
+
+from .rule_engine import (
+    CRITICAL, CROP_CODES, STAGE_CODES, THRESHOLDS, UNKNOWN_CROP, UNKNOWN_STAGE, Threshold
+)
+from .stress_types import StressType
+
+
+class Reason(IntEnum):
+    """Validation reasons written by the kernel"""
+    LOW_CONFIDENCE = 0
+    HIGH_DRY_PERIOD = 1
+    CRITICAL_STAGE = 2
+    SUFFICIENT_RAINFALL = 3
+    VALIDATED = 4
+    EXTREME_HEAT = 5
+    CRITICAL_STAGE_HEAT = 6
+    NORMAL_TEMPERATURE = 7
+    HEAVY_RAINFALL_POOR_DRAINAGE = 8
+    GOOD_DRAINAGE = 9
+    RECENT_HEAVY_RAIN = 10
+    INSUFFICIENT_RAINFALL = 11
+    RULE_OVERRIDE_MOISTURE = 12
+    RULE_OVERRIDE_HEAT = 13
+    RULE_OVERRIDE_WATERLOGGING = 14
+    VALIDATED_NO_STRESS = 15
+
+
+# Reason code -> validation reason
+REASONS = [reason.name.lower() for reason in Reason]
+
+
+@njit(cache=True, nogil=True)
+def _apply_rules_kernel(dry, rain, rolling, moist, temp, tdev, heat, soil, water,
+                        ml_pred, ml_conf, stage_code, crop_code, critical, thresholds,
+                        out_label, out_conf, out_reason):
+    """
+    Apply the apply_rules decision tree to every sample
+    
+    Args:
+        dry ... water: Per-sample float feature columns
+        ml_pred: ML prediction codes (StressType)
+        ml_conf: ML confidences
+        stage_code, crop_code: Indices into critical / thresholds
+        critical: (n_crops, n_stages) critical growth stage matrix
+        thresholds: (n_crops, n_thresholds) validator rule thresholds
+        out_label, out_conf, out_reason: (N,) output buffers for StressType,
+            confidence and Reason codes
+    """
+    for i in range(ml_pred.shape[0]):
+        pred = ml_pred[i]
+        conf = ml_conf[i]
+        is_critical = critical[crop_code[i], stage_code[i]]
+        t = thresholds[crop_code[i]]
+        label = pred
+        reason = Reason.VALIDATED
+        
+        if conf < 0.45:
+            label = StressType.NO_STRESS
+            conf = 0.0
+            reason = Reason.LOW_CONFIDENCE
+        
+        elif pred == StressType.MOISTURE_STRESS:
+            if dry[i] > t[Threshold.DRY_HIGH.value] and rolling[i] < t[Threshold.RAIN_LOW.value] and moist[i] > t[Threshold.MOISTURE_HIGH.value]:
+                conf = max(conf, t[Threshold.MOISTURE_FLOOR.value])
+                reason = Reason.HIGH_DRY_PERIOD
+            elif is_critical and moist[i] > t[Threshold.MOISTURE_CRITICAL.value]:
+                conf = min(conf * t[Threshold.MOISTURE_BOOST.value], t[Threshold.MOISTURE_CAP.value])
+                reason = Reason.CRITICAL_STAGE
+            elif rolling[i] > t[Threshold.RAIN_SUFFICIENT.value] and dry[i] < t[Threshold.DRY_LOW.value]:
+                label = StressType.NO_STRESS
+                conf = 0.0
+                reason = Reason.SUFFICIENT_RAINFALL
+        
+        elif pred == StressType.HEAT_STRESS:
+            if temp[i] > t[Threshold.TEMP_HIGH.value] and tdev[i] > t[Threshold.TEMP_DEV_HIGH.value]:
+                conf = max(conf, t[Threshold.HEAT_FLOOR.value])
+                reason = Reason.EXTREME_HEAT
+            elif is_critical and heat[i] > t[Threshold.HEAT_CRITICAL.value]:
+                conf = min(conf * t[Threshold.HEAT_BOOST.value], t[Threshold.HEAT_CAP.value])
+                reason = Reason.CRITICAL_STAGE_HEAT
+            elif temp[i] < t[Threshold.TEMP_LOW.value] and tdev[i] < t[Threshold.TEMP_DEV_LOW.value]:
+                label = StressType.NO_STRESS
+                conf = 0.0
+                reason = Reason.NORMAL_TEMPERATURE
+        
+        elif pred == StressType.WATERLOGGING:
+            if rolling[i] > t[Threshold.ROLLING_RAIN_HIGH.value] and soil[i] > t[Threshold.POOR_DRAINAGE.value]:
+                conf = max(conf, t[Threshold.WATER_FLOOR.value])
+                reason = Reason.HEAVY_RAINFALL_POOR_DRAINAGE
+            elif soil[i] < t[Threshold.GOOD_DRAINAGE.value]:
+                label = StressType.NO_STRESS
+                conf = 0.0
+                reason = Reason.GOOD_DRAINAGE
+            elif rain[i] > t[Threshold.RECENT_RAIN_HIGH.value] and rolling[i] > t[Threshold.RECENT_ROLLING_RAIN.value]:
+                conf = min(conf * t[Threshold.WATER_BOOST.value], t[Threshold.WATER_CAP.value])
+                reason = Reason.RECENT_HEAVY_RAIN
+            elif rolling[i] < t[Threshold.ROLLING_RAIN_LOW.value]:
+                label = StressType.NO_STRESS
+                conf = 0.0
+                reason = Reason.INSUFFICIENT_RAINFALL
+        
+        else:
+            # Priority order, as in validate_no_stress (not an argmax)
+            if moist[i] > 0.8:
+                label = StressType.MOISTURE_STRESS
+                conf = 0.75
+                reason = Reason.RULE_OVERRIDE_MOISTURE
+            elif heat[i] > 0.8:
+                label = StressType.HEAT_STRESS
+                conf = 0.75
+                reason = Reason.RULE_OVERRIDE_HEAT
+            elif water[i] > 0.8:
+                label = StressType.WATERLOGGING
+                conf = 0.75
+                reason = Reason.RULE_OVERRIDE_WATERLOGGING
+            else:
+                label = StressType.NO_STRESS
+                reason = Reason.VALIDATED_NO_STRESS
+        
+        out_label[i] = label
+        out_conf[i] = conf
+        out_reason[i] = reason
+
+
+def apply_rules_batch(
+    features: Dict[str, np.ndarray],
+    ml_prediction: np.ndarray,
+    ml_confidence: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Apply rule-based validation to a batch of ML predictions
+    
+    Row i matches apply_rules on the same sample, with the stress type and
+    reason returned as codes; decode with STRESS_TYPES and REASONS.
+    
+    Args:
+        features: Struct-of-arrays features from engineer_features_batch
+        ml_prediction: ML prediction codes (StressType)
+        ml_confidence: ML confidence per sample
+    
+    Returns:
+        (StressType codes, final confidences, Reason codes) arrays
+    """
+    n = len(ml_prediction)
+    crop_code = np.array(
+        [CROP_CODES.get(crop_type, UNKNOWN_CROP) for crop_type in features['crop_type']],
+        dtype=np.intp
+    )
+    stage_code = np.array(
+        [STAGE_CODES.get(growth_stage, UNKNOWN_STAGE) for growth_stage in features['growth_stage']],
+        dtype=np.intp
+    )
+    
+    labels = np.empty(n, dtype=np.intp)
+    confidences = np.empty(n, dtype=np.float64)
+    reasons = np.empty(n, dtype=np.intp)
+    
+    _apply_rules_kernel(
+        features['dry_days_norm'],
+        features['rainfall_norm'],
+        features['rolling_rainfall_norm'],
+        features['moisture_stress'],
+        features['avg_temp_norm'],
+        features['temp_deviation_norm'],
+        features['heat_stress'],
+        features['soil_retention'],
+        features['waterlogging'],
+        np.asarray(ml_prediction, dtype=np.intp),
+        np.asarray(ml_confidence, dtype=np.float64),
+        stage_code,
+        crop_code,
+        CRITICAL,
+        THRESHOLDS,
+        labels,
+        confidences,
+        reasons
+    )
+    
+    return labels, confidences, reasons
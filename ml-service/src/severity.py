@@ -3,13 +3,110 @@ Severity Module
 Compute stress severity levels
 """
 
-from typing import Tuple
+import numpy as np
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
+
+from .feature_engineering import FeatureVec
+from .stress_types import StressType
+
+
+class Severity(IntEnum):
+    """Severity levels; escalation moves LOW -> MEDIUM -> HIGH"""
+    LOW = 0
+    MEDIUM = 1
+    HIGH = 2
+    NONE = 3
+
+
+# Severity level index -> name / color
+SEVERITY_LEVELS = [severity.name.lower() for severity in Severity]
+SEVERITY_COLORS = ['yellow', 'amber', 'red', 'green']
+
+# Confidence cut points between low | medium | high
+CONFIDENCE_BANDS = [0.60, 0.80]
+
+CRITICAL_SEVERITY_STAGES = frozenset({'flowering', 'grain_filling', 'boll_development'})
+
+# Medium moisture stress escalates on soil retaining less than this (sandy),
+# medium heat stress in this season
+SANDY_SOIL_RETENTION = 0.20
+HEAT_ESCALATION_SEASON = 'summer'
+
+
+def _frozen(mapping: dict) -> MappingProxyType:
+    """Recursively wrap nested dicts in read-only views"""
+    return MappingProxyType({
+        key: _frozen(value) if isinstance(value, dict) else value
+        for key, value in mapping.items()
+    })
+
+
+# Per stress type: level -> confidence / indicator thresholds
+SEVERITY_THRESHOLDS = _frozen({
+    'moisture_stress': {
+        'low': {'confidence': 0.45, 'indicator': 0.50},
+        'medium': {'confidence': 0.60, 'indicator': 0.65},
+        'high': {'confidence': 0.80, 'indicator': 0.80}
+    },
+    'heat_stress': {
+        'low': {'confidence': 0.45, 'indicator': 0.55},
+        'medium': {'confidence': 0.60, 'indicator': 0.70},
+        'high': {'confidence': 0.80, 'indicator': 0.85}
+    },
+    'waterlogging': {
+        'low': {'confidence': 0.45, 'indicator': 0.50},
+        'medium': {'confidence': 0.60, 'indicator': 0.65},
+        'high': {'confidence': 0.80, 'indicator': 0.80}
+    }
+})
+
+_NO_THRESHOLDS = MappingProxyType({})
+
+
+def severity_level(
+    stress_type: str,
+    confidence: float,
+    features: FeatureVec
+) -> int:
+    """
+    Compute the Severity level of a validated prediction
+    
+    Args:
+        stress_type: Type of stress
+        confidence: Confidence score (0-1)
+        features: Engineered features
+    
+    Returns:
+        Severity level as a plain int (index into SEVERITY_LEVELS)
+    """
+    if stress_type == 'no_stress':
+        return int(Severity.NONE)
+    
+    # Base severity from confidence: 0=low, 1=medium, 2=high
+    level = 2 if confidence >= CONFIDENCE_BANDS[1] else 1 if confidence >= CONFIDENCE_BANDS[0] else 0
+    
+    # Critical stages raise low and medium by one level
+    if level < 2 and features.growth_stage in CRITICAL_SEVERITY_STAGES:
+        level += 1
+    
+    # Sandy soil (moisture stress) and summer heat only escalate medium, after
+    # the stage bump: low sandy moisture stress at a non-critical stage stays
+    # low, where a flat sum of bumps would make it medium
+    if level == 1 and (
+        (stress_type == 'moisture_stress' and features.soil_retention < SANDY_SOIL_RETENTION) or
+        (stress_type == 'heat_stress' and features.season.lower() == HEAT_ESCALATION_SEASON)
+    ):
+        level = 2
+    
+    return level
 
 
 def compute_severity(
     stress_type: str,
     confidence: float,
-    features: dict
+    features: FeatureVec
 ) -> Tuple[str, str]:
     """
     Compute severity level and color code
@@ -22,53 +119,54 @@ def compute_severity(
     Returns:
         (severity_level, severity_color)
     """
-    if stress_type == 'no_stress':
-        return 'none', 'green'
-    
-    # Base severity from confidence
-    if confidence >= 0.80:
-        base_severity = 'high'
-    elif confidence >= 0.60:
-        base_severity = 'medium'
-    else:
-        base_severity = 'low'
-    
-    # Adjust for growth stage
-    growth_stage = features.get('growth_stage', '')
-    crop_type = features.get('crop_type', '')
-    
-    # Critical stages increase severity
-    critical_stages = ['flowering', 'grain_filling', 'boll_development']
-    if growth_stage in critical_stages:
-        if base_severity == 'medium':
-            base_severity = 'high'
-        elif base_severity == 'low':
-            base_severity = 'medium'
-    
-    # Adjust for soil type (moisture stress only)
-    if stress_type == 'moisture_stress':
-        soil_retention = features.get('soil_retention', 0.30)
-        if soil_retention < 0.20:  # Sandy soil - worse moisture retention
-            if base_severity == 'medium':
-                base_severity = 'high'
-    
-    # Adjust for season
-    season = features.get('season', '').lower()
-    if stress_type == 'heat_stress' and season == 'summer':
-        if base_severity == 'medium':
-            base_severity = 'high'
-    
-    # Map severity to colors
-    color_map = {
-        'low': 'yellow',
-        'medium': 'amber',
-        'high': 'red'
-    }
+    level = severity_level(stress_type, confidence, features)
+    return SEVERITY_LEVELS[level], SEVERITY_COLORS[level]
+
+
+def compute_severity_batch(
+    stress_types: np.ndarray,
+    confidences: np.ndarray,
+    features: Dict[str, np.ndarray]
+) -> List[Tuple[str, str]]:
+    """
+    Compute severity levels for many predictions with array operations
+    
+    Same banding and escalation as severity_level: the base level comes
+    from one np.digitize over all confidences, then each adjustment is a
+    boolean mask.
+    
+    Args:
+        stress_types: Validated StressType code per sample
+        confidences: Validated confidence per sample
+        features: Struct-of-arrays features from engineer_features_batch
+    
+    Returns:
+        List of (severity_level, severity_color)
+    """
+    stress = np.asarray(stress_types)
+    growth_stage = features['growth_stage']
+    soil_retention = features['soil_retention']
+    season = np.array([season.lower() for season in features['season']], dtype=object)
+    
+    # Base severity from confidence: LOW, MEDIUM or HIGH
+    level = np.digitize(np.asarray(confidences, dtype=np.float64), CONFIDENCE_BANDS)
+    
+    # Critical stages raise low and medium by one level
+    critical = np.isin(growth_stage, list(CRITICAL_SEVERITY_STAGES))
+    level = np.minimum(level + critical, Severity.HIGH)
     
-    return base_severity, color_map.get(base_severity, 'gray')
+    # Sandy soil (moisture stress) and summer heat only escalate medium
+    escalate = (
+        ((stress == StressType.MOISTURE_STRESS) & (soil_retention < SANDY_SOIL_RETENTION)) |
+        ((stress == StressType.HEAT_STRESS) & (season == HEAT_ESCALATION_SEASON))
+    )
+    level[escalate & (level == Severity.MEDIUM)] = Severity.HIGH
+    level[stress == StressType.NO_STRESS] = Severity.NONE
+    
+    return [(SEVERITY_LEVELS[lvl], SEVERITY_COLORS[lvl]) for lvl in level.tolist()]
 
 
-def get_severity_thresholds(stress_type: str) -> dict:
+def get_severity_thresholds(stress_type: str) -> Mapping[str, Mapping[str, float]]:
     """
     Get threshold values for different severity levels
     
@@ -76,24 +174,6 @@ def get_severity_thresholds(stress_type: str) -> dict:
         stress_type: Type of stress
     
     Returns:
-        Dictionary of thresholds
+        Read-only mapping of thresholds
     """
-    thresholds = {
-        'moisture_stress': {
-            'low': {'confidence': 0.45, 'indicator': 0.50},
-            'medium': {'confidence': 0.60, 'indicator': 0.65},
-            'high': {'confidence': 0.80, 'indicator': 0.80}
-        },
-        'heat_stress': {
-            'low': {'confidence': 0.45, 'indicator': 0.55},
-            'medium': {'confidence': 0.60, 'indicator': 0.70},
-            'high': {'confidence': 0.80, 'indicator': 0.85}
-        },
-        'waterlogging': {
-            'low': {'confidence': 0.45, 'indicator': 0.50},
-            'medium': {'confidence': 0.60, 'indicator': 0.65},
-            'high': {'confidence': 0.80, 'indicator': 0.80}
-        }
-    }
-    
-    return thresholds.get(stress_type, {})
+    return SEVERITY_THRESHOLDS.get(stress_type, _NO_THRESHOLDS)
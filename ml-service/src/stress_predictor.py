@@ -3,14 +3,74 @@ Main Stress Predictor
 Orchestrates the entire prediction pipeline
 """
 
-from typing import Dict, Any
-from .feature_engineering import engineer_features
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Dict, Any, List
+from .feature_engineering import (
+    FeatureVec, engineer_features_batch, engineer_features_from_key, feature_key, split_feature_rows
+)
 from .model import StressMLModel
-from .rule_engine import apply_rules
-from .severity import compute_severity
+from .rule_engine import classify_and_score
+from .rule_engine_numba import REASONS, apply_rules_batch
+from .stress_types import STRESS_TYPES
+from .severity import compute_severity_batch
 from .explainer import generate_explanation, generate_advisory
 
 
+class _FrozenSlots:
+    """
+    Pickle/copy support for frozen dataclasses with __slots__
+    
+    With no instance __dict__, pickle and copy fall back to setattr and
+    hit FrozenInstanceError; restore the fields through object.__setattr__.
+    """
+    __slots__ = ()
+    
+    def __getstate__(self):
+        return tuple(getattr(self, f.name) for f in fields(self))
+    
+    def __setstate__(self, state):
+        for f, value in zip(fields(self), state):
+            object.__setattr__(self, f.name, value)
+
+
+@dataclass(frozen=True)
+class PredictionMetadata(_FrozenSlots):
+    """Pipeline details behind a prediction"""
+    __slots__ = (
+        'growth_stage', 'days_after_sowing', 'season',
+        'ml_prediction', 'ml_confidence', 'validation_reason'
+    )
+    growth_stage: str
+    days_after_sowing: int
+    season: str
+    ml_prediction: str
+    ml_confidence: float
+    validation_reason: str
+
+
+@dataclass(frozen=True)
+class PredictionResult(_FrozenSlots):
+    """
+    Complete prediction result
+    
+    Immutable, so cached results can be handed to every caller (and
+    pickled or copied). Confidences are kept as raw 0-1 floats; the API
+    converts them to rounded percentages when it serializes the result.
+    """
+    __slots__ = (
+        'stress_type', 'severity', 'severity_color', 'confidence',
+        'advisory', 'explanation', 'metadata'
+    )
+    stress_type: str
+    severity: str
+    severity_color: str
+    confidence: float
+    advisory: str
+    explanation: str
+    metadata: PredictionMetadata
+
+
 class CropStressPredictor:
     """
     Main orchestrator for crop stress prediction
@@ -18,37 +78,87 @@ class CropStressPredictor:
     
     def __init__(self):
         self.ml_model = StressMLModel()
+        
+        # Complete results for repeated inputs, keyed on feature_key
+        self._predict_cached = lru_cache(maxsize=4096)(self._predict_key)
+        
+        # Warm up so the first batch doesn't pay JIT compilation
+        self.batch_predict_fast([])
     
-    def predict(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    def predict(self, input_data: Dict[str, Any]) -> PredictionResult:
         """
         Complete prediction pipeline
         
         Args:
             input_data: Raw input data containing crop, weather, soil info
         
+        Returns:
+            Complete prediction result with explanations
+        """
+        return self._predict_cached(feature_key(input_data))
+    
+    def _predict_key(self, key: tuple) -> PredictionResult:
+        """
+        Run the pipeline for one feature_key (uncached)
+        
+        Args:
+            key: Output of feature_key
+        
         Returns:
             Complete prediction result with explanations
         """
         # Step 1: Feature Engineering
-        features = engineer_features(input_data)
+        features = engineer_features_from_key(key)
         
         # Step 2: ML Model Prediction
         ml_stress_type, ml_confidence = self.ml_model.predict(features)
         
-        # Step 3: Rule-based Validation
-        validated_stress_type, validated_confidence, validation_reason = apply_rules(
+        return self._finalize(features, ml_stress_type, ml_confidence)
+    
+    def _finalize(self, features: FeatureVec, ml_stress_type: str, ml_confidence: float) -> PredictionResult:
+        """
+        Validate, score and explain a single ML prediction (steps 3-6)
+        
+        Args:
+            features: Engineered features
+            ml_stress_type: ML model prediction
+            ml_confidence: ML model confidence
+        
+        Returns:
+            Complete prediction result with explanations
+        """
+        # Steps 3-4: Rule-based Validation and Severity
+        (validated_stress_type, validated_confidence, validation_reason,
+         severity, severity_color) = classify_and_score(features, ml_stress_type, ml_confidence)
+        
+        return self._package(
             features,
             ml_stress_type,
-            ml_confidence
-        )
-        
-        # Step 4: Compute Severity
-        severity, severity_color = compute_severity(
+            ml_confidence,
             validated_stress_type,
             validated_confidence,
-            features
+            validation_reason,
+            severity,
+            severity_color
         )
+    
+    def _package(
+        self,
+        features: FeatureVec,
+        ml_stress_type: str,
+        ml_confidence: float,
+        validated_stress_type: str,
+        validated_confidence: float,
+        validation_reason: str,
+        severity: str,
+        severity_color: str
+    ) -> PredictionResult:
+        """
+        Explain a scored prediction and build the result (steps 5-6)
         
+        Returns:
+            Complete prediction result with explanations
+        """
         # Step 5: Generate Explanation
         explanation = generate_explanation(
             validated_stress_type,
@@ -66,26 +176,45 @@ class CropStressPredictor:
         )
         
         # Package results
-        result = {
-            'stress_type': validated_stress_type,
-            'severity': severity,
-            'severity_color': severity_color,
-            'confidence': round(validated_confidence * 100, 1),
-            'advisory': advisory,
-            'explanation': explanation,
-            'metadata': {
-                'growth_stage': features['growth_stage'],
-                'days_after_sowing': features['days_after_sowing'],
-                'season': features['season'],
-                'ml_prediction': ml_stress_type,
-                'ml_confidence': round(ml_confidence * 100, 1),
-                'validation_reason': validation_reason
-            }
-        }
+        return PredictionResult(
+            stress_type=validated_stress_type,
+            severity=severity,
+            severity_color=severity_color,
+            confidence=validated_confidence,
+            advisory=advisory,
+            explanation=explanation,
+            metadata=PredictionMetadata(
+                growth_stage=features.growth_stage,
+                days_after_sowing=features.days_after_sowing,
+                season=features.season,
+                ml_prediction=ml_stress_type,
+                ml_confidence=ml_confidence,
+                validation_reason=validation_reason
+            )
+        )
+    
+    def _score_batch(self, input_batch: list) -> tuple:
+        """
+        Run steps 1-4 over a batch as array operations
+        
+        Features are kept struct-of-arrays throughout, so the model runs once
+        on an (N, 11) matrix and rules and severity are evaluated as masks.
+        Stress types and reasons stay integer codes (StressType, Reason)
+        until the results are packaged.
+        
+        Returns:
+            (features, ml_stress_codes, ml_confidences, stress_codes,
+             confidences, reason_codes, severities) for the whole batch
+        """
+        features = engineer_features_batch(input_batch)
+        
+        ml_codes, ml_confidences = self.ml_model.predict_batch(self.ml_model.feature_matrix(features))
+        stress_codes, confidences, reason_codes = apply_rules_batch(features, ml_codes, ml_confidences)
+        severities = compute_severity_batch(stress_codes, confidences, features)
         
-        return result
+        return features, ml_codes, ml_confidences, stress_codes, confidences, reason_codes, severities
     
-    def batch_predict(self, input_batch: list) -> list:
+    def batch_predict(self, input_batch: list) -> List[PredictionResult]:
         """
         Predict for multiple inputs
         
@@ -95,4 +224,53 @@ class CropStressPredictor:
         Returns:
             List of prediction results
         """
-        return [self.predict(input_data) for input_data in input_batch]
+        (features, ml_codes, ml_confidences,
+         stress_codes, confidences, reason_codes, severities) = self._score_batch(input_batch)
+        
+        return [
+            self._package(
+                row, STRESS_TYPES[ml_code], ml_confidence,
+                STRESS_TYPES[stress_code], confidence, REASONS[reason_code], *severity
+            )
+            for row, (ml_code, ml_confidence, stress_code, confidence, reason_code), severity in zip(
+                split_feature_rows(features),
+                zip(
+                    ml_codes.tolist(),
+                    ml_confidences.tolist(),
+                    stress_codes.tolist(),
+                    confidences.tolist(),
+                    reason_codes.tolist()
+                ),
+                severities
+            )
+        ]
+    
+    def batch_predict_fast(self, input_batch: list) -> Dict[str, list]:
+        """
+        Predict stress labels only, skipping explanations and advisories
+        
+        Args:
+            input_batch: List of input data dictionaries
+        
+        Returns:
+            Column-oriented results: {'stress': [...], 'severity': [...], 'confidence': [...]}
+            with raw 0-1 confidences
+        """
+        _, _, _, stress_codes, confidences, _, severities = self._score_batch(input_batch)
+        
+        return {
+            'stress': [STRESS_TYPES[stress_code] for stress_code in stress_codes.tolist()],
+            'severity': [severity for severity, _ in severities],
+            'confidence': confidences.tolist()
+        }
+
+
+@lru_cache(maxsize=1)
+def get_predictor() -> CropStressPredictor:
+    """
+    Process-wide predictor, built (model loaded and kernels warmed) on first use
+    
+    Returns:
+        Shared CropStressPredictor
+    """
+    return CropStressPredictor()
@@ -0,0 +1,18 @@
+"""
+Stress Types Module
+Integer codes shared by the model and the array kernels
+"""
+
+from enum import IntEnum
+
+
+class StressType(IntEnum):
+    """Stress classes, valued by the model's class index"""
+    MOISTURE_STRESS = 0
+    HEAT_STRESS = 1
+    WATERLOGGING = 2
+    NO_STRESS = 3
+
+
+# Class index -> stress type name
+STRESS_TYPES = [stress_type.name.lower() for stress_type in StressType]
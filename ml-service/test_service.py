@@ -2,15 +2,49 @@
 Test ML Service - Simple validation script
 """
 
+import copy
+import importlib.util
+import pickle
+import random
 import sys
-import json
-from datetime import datetime
+from datetime import date, timedelta
+from unittest import SkipTest, mock
 
-# Add src to path
-sys.path.insert(0, 'src')
+import numpy as np
+import orjson
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+
+import app
+from src import rule_engine, rule_engine_numba
+from src.feature_engineering import (
+    GROWTH_STAGES, SEASON_ENCODING, SOIL_WATER_RETENTION, FeatureVec, engineer_features
+)
+from src.rule_engine import CRITICAL_STAGES, DEFAULT_THRESHOLDS, RULES_BY_CROP, apply_rules
+from src.rule_engine_numba import REASONS, apply_rules_batch
+from src.stress_predictor import get_predictor
+from src.stress_types import STRESS_TYPES
+
+# Built once per process: loads the model and warms the JIT kernels
+predictor = get_predictor()
+client = TestClient(app.app)
+
+# Shared sample input
+TEST_INPUT = {
+    "crop_type": "wheat",
+    "sowing_date": "2025-11-15",
+    "soil_type": "loam",
+    "season": "winter",
+    "weather": {
+        "avg_temp": 32.0,
+        "rainfall": 2.0,
+        "rolling_7day_rainfall": 8.0,
+        "consecutive_dry_days": 10,
+        "temp_deviation_from_normal": 4.5
+    }
+}
 
-from feature_engineering import engineer_features
-from stress_predictor import CropStressPredictor
 
 def test_prediction():
     """Test the ML prediction pipeline"""
@@ -21,31 +55,13 @@ def test_prediction():
     print()
     
     # Test input
-    test_input = {
-        "crop_type": "wheat",
-        "sowing_date": "2025-11-15",
-        "soil_type": "loam",
-        "season": "winter",
-        "weather": {
-            "avg_temp": 32.0,
-            "rainfall": 2.0,
-            "rolling_7day_rainfall": 8.0,
-            "consecutive_dry_days": 10,
-            "temp_deviation_from_normal": 4.5
-        }
-    }
+    test_input = TEST_INPUT
     
     print("Input Data:")
-    print(json.dumps(test_input, indent=2))
+    print(orjson.dumps(test_input, option=orjson.OPT_INDENT_2).decode())
     print()
     
     try:
-        # Initialize predictor
-        print("Initializing ML model...")
-        predictor = CropStressPredictor()
-        print("✓ Model initialized successfully")
-        print()
-        
         # Run prediction
         print("Running prediction pipeline...")
         result = predictor.predict(test_input)
@@ -57,21 +73,21 @@ def test_prediction():
         print("PREDICTION RESULTS")
         print("=" * 60)
         print()
-        print(f"Stress Type:    {result['stress_type']}")
-        print(f"Severity:       {result['severity']} ({result['severity_color']})")
-        print(f"Confidence:     {result['confidence']}%")
+        print(f"Stress Type:    {result.stress_type}")
+        print(f"Severity:       {result.severity} ({result.severity_color})")
+        print(f"Confidence:     {result.confidence * 100:.1f}%")
         print()
         print(f"Advisory:")
-        print(f"  {result['advisory']}")
+        print(f"  {result.advisory}")
         print()
         print(f"Explanation:")
-        print(f"  {result['explanation']}")
+        print(f"  {result.explanation}")
         print()
         print(f"Metadata:")
-        print(f"  Growth Stage: {result['metadata']['growth_stage']}")
-        print(f"  Days After Sowing: {result['metadata']['days_after_sowing']}")
-        print(f"  ML Prediction: {result['metadata']['ml_prediction']} ({result['metadata']['ml_confidence']}%)")
-        print(f"  Validation: {result['metadata']['validation_reason']}")
+        print(f"  Growth Stage: {result.metadata.growth_stage}")
+        print(f"  Days After Sowing: {result.metadata.days_after_sowing}")
+        print(f"  ML Prediction: {result.metadata.ml_prediction} ({result.metadata.ml_confidence * 100:.1f}%)")
+        print(f"  Validation: {result.metadata.validation_reason}")
         print()
         print("=" * 60)
         print("✓ TEST PASSED - ML Service Working Correctly")
@@ -86,6 +102,327 @@ def test_prediction():
         return False
 
 
+def test_result_pickle_and_copy():
+    """Cached results survive pickling and copying unchanged"""
+    result = predictor.predict(TEST_INPUT)
+    
+    assert pickle.loads(pickle.dumps(result)) == result
+    assert copy.copy(result) == result
+    assert copy.deepcopy(result) == result
+
+
+def _raises(exception: type, func, *args) -> bool:
+    """Whether func(*args) raises exception"""
+    try:
+        func(*args)
+    except exception:
+        return True
+    return False
+
+
+def test_non_finite_weather_rejected():
+    """NaN/infinite weather is rejected at the API and by the model"""
+    body = orjson.dumps(TEST_INPUT).replace(b'32.0', b'NaN')
+    response = client.post('/api/predict', content=body, headers={'Content-Type': 'application/json'})
+    assert response.status_code == 422
+    
+    ml_model = predictor.ml_model
+    features = engineer_features(TEST_INPUT)
+    for value in (float('nan'), float('inf')):
+        assert _raises(ValueError, ml_model.predict, features._replace(avg_temp_norm=value))
+        
+        X = np.zeros((3, len(ml_model.feature_names)), dtype=np.float32)
+        X[1, 3] = value
+        assert _raises(ValueError, ml_model.predict_batch, X)
+
+
+def _preflight(test_client: TestClient, origin: str, method: str = 'POST', headers: str = 'content-type'):
+    """Send a CORS preflight for /api/predict"""
+    return test_client.options('/api/predict', headers={
+        'Origin': origin,
+        'Access-Control-Request-Method': method,
+        'Access-Control-Request-Headers': headers
+    })
+
+
+def test_cors_preflight():
+    """Preflights are answered per ALLOWED_ORIGINS, as CORSMiddleware would"""
+    origin = app.ALLOWED_ORIGINS[0]
+    response = _preflight(client, origin)
+    assert response.status_code == 200
+    assert response.headers['access-control-allow-origin'] == origin
+    assert response.headers['access-control-allow-credentials'] == 'true'
+    assert response.headers['access-control-allow-headers'] == 'content-type'
+    assert 'POST' in response.headers['access-control-allow-methods']
+    
+    response = _preflight(client, 'https://evil.example.com')
+    assert response.status_code == 400
+    assert 'access-control-allow-origin' not in response.headers
+
+
+def test_cors_preflight_tightened_policy():
+    """PreflightMiddleware never grants more than the CORSMiddleware policy"""
+    origin = 'https://app.example.com'
+    policy = dict(
+        allow_origins=[origin], allow_methods=['GET'], allow_headers=['X-Token'],
+        allow_credentials=False, max_age=60
+    )
+    tightened = FastAPI()
+    tightened.add_middleware(CORSMiddleware, **policy)
+    tightened.add_middleware(app.PreflightMiddleware, **policy)
+    test_client = TestClient(tightened)
+    
+    response = _preflight(test_client, origin, method='GET', headers='x-token')
+    assert response.status_code == 200
+    assert response.headers['access-control-allow-methods'] == 'GET'
+    assert 'access-control-allow-credentials' not in response.headers
+    assert _preflight(test_client, origin, method='POST', headers='x-token').status_code == 400
+    assert _preflight(test_client, origin, method='GET', headers='x-other').status_code == 400
+
+def _mixed_case(rng: random.Random, name: str) -> str:
+    """name in a random client casing, sometimes space separated"""
+    if rng.random() < 0.3:
+        name = name.replace('_', ' ')
+    return rng.choice([
+        name, name.upper(), name.title(),
+        ''.join(c.upper() if rng.random() < 0.5 else c for c in name)
+    ])
+
+
+def _random_inputs(n: int, seed: int) -> list:
+    """Random raw inputs with mixed-case crop, season and soil values"""
+    rng = random.Random(seed)
+    today = date.today()
+    
+    return [
+        {
+            "crop_type": _mixed_case(rng, rng.choice(list(GROWTH_STAGES))),
+            "sowing_date": (today - timedelta(days=rng.randint(0, 180))).isoformat(),
+            "soil_type": _mixed_case(rng, rng.choice(list(SOIL_WATER_RETENTION))),
+            "season": _mixed_case(rng, rng.choice(list(SEASON_ENCODING))),
+            "weather": {
+                "avg_temp": rng.uniform(10.0, 48.0),
+                "rainfall": rng.uniform(0.0, 120.0),
+                "rolling_7day_rainfall": rng.uniform(0.0, 250.0),
+                "consecutive_dry_days": rng.randint(0, 20),
+                "temp_deviation_from_normal": rng.uniform(-12.0, 12.0)
+            }
+        }
+        for _ in range(n)
+    ]
+
+
+def test_batch_predict_matches_predict():
+    """The vectorized batch paths agree with predict input by input"""
+    inputs = _random_inputs(3000, seed=11)
+    expected = [predictor.predict(input_data) for input_data in inputs]
+    
+    assert predictor.batch_predict(inputs) == expected
+    
+    fast = predictor.batch_predict_fast(inputs)
+    assert fast == {
+        'stress': [result.stress_type for result in expected],
+        'severity': [result.severity for result in expected],
+        'confidence': [result.confidence for result in expected]
+    }
+
+
+def _expected_json(result) -> dict:
+    """Public /api/predict shape of a PredictionResult, confidences as percentages"""
+    metadata = result.metadata
+    return {
+        "stress_type": result.stress_type,
+        "severity": result.severity,
+        "severity_color": result.severity_color,
+        "confidence": round(result.confidence * 100, 1),
+        "advisory": result.advisory,
+        "explanation": result.explanation,
+        "metadata": {
+            "growth_stage": metadata.growth_stage,
+            "days_after_sowing": metadata.days_after_sowing,
+            "season": metadata.season,
+            "ml_prediction": metadata.ml_prediction,
+            "ml_confidence": round(metadata.ml_confidence * 100, 1),
+            "validation_reason": metadata.validation_reason
+        }
+    }
+
+
+def test_api_response_json():
+    """Prediction endpoints serialize results with percentage confidences"""
+    inputs = _random_inputs(50, seed=13)
+    
+    for input_data in inputs:
+        response = client.post('/api/predict', json=input_data)
+        assert response.status_code == 200
+        assert response.content == orjson.dumps(_expected_json(predictor.predict(input_data)))
+    
+    response = client.post('/api/batch-predict-fast', json=inputs)
+    assert response.status_code == 200
+    results = [predictor.predict(input_data) for input_data in inputs]
+    assert response.content == orjson.dumps({
+        "stress": [result.stress_type for result in results],
+        "severity": [result.severity for result in results],
+        "confidence": [round(result.confidence * 100, 1) for result in results]
+    })
+
+
+def test_predict_batch_matches_sklearn():
+    """The compiled forest agrees with the sklearn estimator it was built from"""
+    ml_model = predictor.ml_model
+    rng = np.random.default_rng(5)
+    n = 3000
+    
+    X = rng.random((n, len(ml_model.feature_names)))
+    X[:, 0] = rng.integers(0, 150, n)
+    X[:, 1] = rng.integers(0, 3, n)
+    
+    # Put some values exactly on split thresholds, where rounding them to
+    # float32 has to keep the same branch
+    thresholds = np.concatenate([
+        estimator.tree_.threshold[estimator.tree_.feature >= 0] for estimator in ml_model.model.estimators_
+    ])
+    features = np.concatenate([
+        estimator.tree_.feature[estimator.tree_.feature >= 0] for estimator in ml_model.model.estimators_
+    ])
+    picks = rng.integers(0, len(thresholds), n // 2)
+    X[np.arange(n // 2), features[picks]] = thresholds[picks]
+    X = X.astype(np.float32)
+    
+    codes, confidences = ml_model.predict_batch(X)
+    probs = ml_model.model.predict_proba(X)
+    
+    np.testing.assert_array_equal(codes, probs.argmax(axis=1))
+    np.testing.assert_allclose(confidences, probs.max(axis=1), rtol=0, atol=1e-6)
+
+
+def test_to_onnx_matches_predict_batch():
+    """The ONNX export predicts like the compiled forest"""
+    if importlib.util.find_spec('skl2onnx') is None or importlib.util.find_spec('onnxruntime') is None:
+        raise SkipTest("requires requirements-onnx.txt")
+    import onnxruntime
+    
+    ml_model = predictor.ml_model
+    X = np.random.default_rng(9).random((500, len(ml_model.feature_names))).astype(np.float32)
+    X[:, 0] *= 150
+    
+    session = onnxruntime.InferenceSession(ml_model.to_onnx())
+    _, probs = session.run(None, {'X': X})
+    codes, confidences = ml_model.predict_batch(X)
+    
+    np.testing.assert_array_equal(codes, probs.argmax(axis=1))
+    np.testing.assert_allclose(confidences, probs.max(axis=1), rtol=0, atol=1e-6)
+
+
+# Rule thresholds changed for one crop by the rule equivalence test
+TUNED_CROP = 'cotton'
+TUNED_THRESHOLDS = {
+    'dry_high': 0.6,
+    'moisture_boost': 1.3,
+    'temp_high': 0.75,
+    'heat_critical': 0.55,
+    'good_drainage': 0.25,
+    'water_cap': 0.85
+}
+
+RULE_FEATURES = (
+    'dry_days_norm', 'rainfall_norm', 'rolling_rainfall_norm', 'avg_temp_norm',
+    'temp_deviation_norm', 'moisture_stress', 'heat_stress', 'waterlogging', 'soil_retention'
+)
+
+
+def _rule_rows(n: int, seed: int) -> list:
+    """Random (features, ml_prediction, ml_confidence) rows, many exactly on a threshold"""
+    rng = random.Random(seed)
+    edges = sorted(
+        value
+        for value in {*DEFAULT_THRESHOLDS.values(), *TUNED_THRESHOLDS.values(), 0.0, 0.45, 0.8, 1.0}
+        if value <= 1.0
+    )
+    stages = ['flowering', 'grain_filling', 'boll_development', 'tillering', 'unknown']
+    
+    rows = []
+    for _ in range(n):
+        values = {name: rng.choice(edges) if rng.random() < 0.4 else rng.random() for name in RULE_FEATURES}
+        features = FeatureVec(
+            crop_type=rng.choice([*CRITICAL_STAGES, 'Wheat', 'barley']),
+            days_after_sowing=0,
+            growth_stage=rng.choice(stages),
+            season_encoded=0,
+            season='winter',
+            soil_type='loam',
+            **values
+        )
+        ml_confidence = rng.choice([0.44, 0.45, rng.choice(edges), rng.random()])
+        rows.append((features, rng.choice(STRESS_TYPES), ml_confidence))
+    
+    return rows
+
+
+def _check_apply_rules_batch(rows: list):
+    """Assert apply_rules_batch matches apply_rules on every row"""
+    features = {
+        'crop_type': np.array([row.crop_type for row, _, _ in rows], dtype=object),
+        'growth_stage': np.array([row.growth_stage for row, _, _ in rows], dtype=object),
+        **{
+            name: np.array([getattr(row, name) for row, _, _ in rows], dtype=np.float64)
+            for name in RULE_FEATURES
+        }
+    }
+    labels, confidences, reasons = apply_rules_batch(
+        features,
+        np.array([STRESS_TYPES.index(prediction) for _, prediction, _ in rows]),
+        np.array([confidence for _, _, confidence in rows])
+    )
+    
+    batch = zip(labels.tolist(), confidences.tolist(), reasons.tolist())
+    for (row, prediction, confidence), (label, final_confidence, reason) in zip(rows, batch):
+        assert (STRESS_TYPES[label], final_confidence, REASONS[reason]) == \
+            apply_rules(row, prediction, confidence), (row, prediction, confidence)
+
+
+def test_apply_rules_batch_matches_apply_rules():
+    """The numba rule kernel agrees with apply_rules row by row"""
+    _check_apply_rules_batch(_rule_rows(20000, seed=3))
+
+
+def test_apply_rules_batch_matches_apply_rules_tuned():
+    """Same, with one crop's thresholds changed in both rule tables"""
+    thresholds = {**RULES_BY_CROP[TUNED_CROP], **TUNED_THRESHOLDS}
+    matrix = rule_engine.THRESHOLDS.copy()
+    matrix[rule_engine.CROP_CODES[TUNED_CROP]] = [thresholds[name] for name in DEFAULT_THRESHOLDS]
+    
+    with mock.patch.dict(
+        rule_engine._VALIDATORS_BY_CROP,
+        {TUNED_CROP: rule_engine._generate_validators(thresholds, CRITICAL_STAGES[TUNED_CROP])}
+    ), mock.patch.object(rule_engine_numba, 'THRESHOLDS', matrix):
+        _check_apply_rules_batch(_rule_rows(20000, seed=3))
+
+
+def run_all() -> bool:
+    """Run every test_* function without pytest; True if none failed"""
+    import traceback
+    
+    failed = []
+    for name, test in list(globals().items()):
+        if not name.startswith('test_') or not callable(test):
+            continue
+        try:
+            passed = test() is not False
+        except SkipTest as e:
+            print(f"- {name} skipped: {e}")
+            continue
+        except Exception:
+            traceback.print_exc()
+            passed = False
+        
+        print(f"{'✓' if passed else '✗'} {name}")
+        if not passed:
+            failed.append(name)
+    
+    return not failed
+
+
 if __name__ == "__main__":
-    success = test_prediction()
+    success = run_all()
     sys.exit(0 if success else 1)
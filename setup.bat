@@ -48,6 +48,7 @@ if %errorlevel% equ 0 (
     python -m venv venv
     call venv\Scripts\activate.bat
     pip install -r requirements.txt
+    python build_model.py
     echo ✓ ML service environment ready
     cd ..
 ) else (
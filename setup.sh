@@ -55,6 +55,7 @@ if command -v python3 &> /dev/null; then
     python3 -m venv venv
     source venv/bin/activate 2>/dev/null || source venv/Scripts/activate 2>/dev/null
     pip install -r requirements.txt
+    python build_model.py
     echo -e "${GREEN}✓ ML service environment ready${NC}"
     cd .. || exit
 else